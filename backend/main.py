@@ -1,9 +1,12 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, JSONResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Iterable, List, Optional
+from contextlib import asynccontextmanager
 import os
+import sys
+import stat
 import asyncio
 import uuid
 import shutil
@@ -11,15 +14,40 @@ import tempfile
 from pathlib import Path
 import zipfile
 import tarfile
-import requests
-from io import BytesIO
+import httpx
+import aiofiles
 import json
+import xxhash
 
-from services.test_generator import TestGenerator
+from services.test_generator import TestGenerator, CACHE_DIR, shutdown_analysis_pool
 from services.llm_service import LLMService
+from services.project_store import ProjectStore
 from models.schemas import TestGenerationRequest, TestGenerationResponse, ProjectInfo
 
-app = FastAPI(title="C++ Unit Test Generator", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release worker processes and open connections when the server shuts down"""
+    yield
+    # Projects live in memory, so their checkpoints cannot be resumed after a restart
+    for project in await active_projects.values():
+        await _delete_checkpoints(project)
+    await llm_service.aclose()
+    await asyncio.to_thread(shutdown_analysis_pool)
+
+app = FastAPI(title="C++ Unit Test Generator", version="1.0.0", lifespan=lifespan)
+
+# Largest accepted upload or repository download, in bytes
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(512 * 1024 * 1024)))
+
+# Registered before CORS so that rejections still carry CORS headers
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Reject oversized uploads before their body is read"""
+    content_length = request.headers.get("content-length", "")
+    if (request.url.path.startswith("/api/upload") and content_length.isdigit()
+            and int(content_length) > MAX_UPLOAD_BYTES):
+        return JSONResponse(status_code=413, content={"detail": "Upload too large"})
+    return await call_next(request)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -34,8 +62,267 @@ app.add_middleware(
 llm_service = LLMService()
 test_generator = TestGenerator(llm_service)
 
-# Store for active projects
-active_projects = {}
+# Background cleanup of evicted projects; references keep the tasks alive
+_cleanup_tasks = set()
+
+async def _delete_checkpoints(project: dict):
+    """Drop the workflow checkpoints left behind by a project's failed runs"""
+    try:
+        await llm_service.delete_run(project["id"], project["files"])
+    except Exception as e:
+        print(f"Could not delete checkpoints of project {project['id']}: {e}")
+
+def _schedule_cleanup(project: dict):
+    """Remove an evicted project's files without blocking the event loop"""
+    for coro in (asyncio.to_thread(_remove_project_files, project["path"], project["objects"]), _delete_checkpoints(project)):
+        task = asyncio.create_task(coro)
+        _cleanup_tasks.add(task)
+        task.add_done_callback(_cleanup_tasks.discard)
+
+# Store for active projects, bounded in count and idle lifetime
+active_projects = ProjectStore(
+    max_projects=int(os.getenv("MAX_ACTIVE_PROJECTS", "256")),
+    ttl=float(os.getenv("PROJECT_TTL_SECONDS", "3600")),
+    on_evict=_schedule_cleanup
+)
+
+# Uploaded projects are unpacked into per-project directories here
+PROJECTS_DIR = Path(__file__).parent / "temp_projects"
+
+# File extensions treated as C++ sources and headers
+CPP_EXTENSIONS = ('.cpp', '.hpp', '.h', '.cc', '.cxx', '.c++')
+
+# Content-addressed store of uploaded files, hard-linked into projects.
+# It sits inside PROJECTS_DIR so that both are on the same filesystem.
+OBJECT_STORE_DIR = PROJECTS_DIR / ".objects"
+
+# Downloaded GitHub archives, keyed by repository and commit SHA and
+# evicted least recently used first once they outgrow the size limit
+GITHUB_CACHE_DIR = CACHE_DIR / "github"
+GITHUB_CACHE_MAX_BYTES = int(os.getenv("TESTGEN_GITHUB_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# Uploads are copied to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Maximum number of uploaded files written to disk at once
+UPLOAD_WRITE_CONCURRENCY = 8
+
+# Writes smaller than this stay on the event loop; a thread hop costs more
+INLINE_WRITE_LIMIT = 64 * 1024
+
+def _check_upload_size(total: int):
+    """Fail once more than MAX_UPLOAD_BYTES have been received"""
+    if total > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Upload too large")
+
+def _copy_upload(source, destination, digest=None):
+    """Copy a file object in chunks, enforcing the upload size limit"""
+    total = 0
+    while chunk := source.read(UPLOAD_CHUNK_SIZE):
+        total += len(chunk)
+        _check_upload_size(total)
+        if digest is not None:
+            digest.update(chunk)
+        destination.write(chunk)
+
+def _object_path(object_hash: str) -> Path:
+    """Location of a stored object, sharded by hash prefix"""
+    return OBJECT_STORE_DIR / object_hash[:2] / object_hash
+
+def _clear_readonly(func, path, _):
+    """rmtree error handler: clear the read-only flag Windows refuses to delete through, then retry"""
+    try:
+        os.chmod(path, stat.S_IWRITE)
+        func(path)
+    except OSError:
+        pass
+
+def _unlink_readonly(path: Path):
+    """Delete a file that may be read-only"""
+    try:
+        path.unlink(missing_ok=True)
+    except PermissionError:
+        _clear_readonly(os.unlink, path, None)
+
+def _store_upload(source, destination: Path) -> str:
+    """Copy an upload into the object store, hard-link it into place and return its hash"""
+    OBJECT_STORE_DIR.mkdir(parents=True, exist_ok=True)
+    digest = xxhash.xxh3_128()
+    fd, tmp_name = tempfile.mkstemp(dir=OBJECT_STORE_DIR)
+    tmp_path = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as out_fh:
+            _copy_upload(source, out_fh, digest)
+        
+        object_hash = digest.hexdigest()
+        object_path = _object_path(object_hash)
+        try:
+            os.link(object_path, destination)
+            return object_hash
+        except FileNotFoundError:
+            # Not stored yet, or pruned meanwhile; publish this copy instead
+            pass
+        except OSError:
+            shutil.copyfile(tmp_path, destination)
+            return object_hash
+        
+        # Link the project copy first, so a concurrent prune never sees the object unreferenced
+        try:
+            os.link(tmp_path, destination)
+        except OSError:
+            shutil.copyfile(tmp_path, destination)
+            return object_hash
+        # Read-only so that no project can modify a shared copy in place
+        os.chmod(tmp_path, 0o444)
+        object_path.parent.mkdir(exist_ok=True)
+        os.replace(tmp_path, object_path)
+        return object_hash
+    finally:
+        _unlink_readonly(tmp_path)
+
+async def _save_upload(upload: UploadFile, destination: Path) -> str:
+    """Stream an uploaded file to disk without buffering it in memory"""
+    if upload.size is not None and upload.size < INLINE_WRITE_LIMIT:
+        return _store_upload(upload.file, destination)
+    return await asyncio.to_thread(_store_upload, upload.file, destination)
+
+def _prune_object_store(object_hashes: Iterable[str]):
+    """Remove the given stored objects if no project links to them any more"""
+    for object_hash in set(object_hashes):
+        object_path = _object_path(object_hash)
+        try:
+            if object_path.stat().st_nlink == 1:
+                _unlink_readonly(object_path)
+            else:
+                # Deleting a link on Windows clears the flag shared by all links
+                os.chmod(object_path, 0o444)
+        except OSError:
+            continue
+
+def _remove_project_files(project_path: Path, object_hashes: Iterable[str] = ()):
+    """Delete a project directory and any objects only it referenced"""
+    if sys.version_info >= (3, 12):
+        shutil.rmtree(project_path, onexc=_clear_readonly)
+    else:
+        shutil.rmtree(project_path, onerror=_clear_readonly)
+    _prune_object_store(object_hashes)
+
+def _extract_zip(source, destination: Path):
+    """Extract a zip archive member by member"""
+    with zipfile.ZipFile(source) as archive:
+        for member in archive.infolist():
+            archive.extract(member, destination)
+
+def _tests_fingerprint(tests_path: Path) -> tuple:
+    """Summarize the test directory by file count, total size and latest mtime"""
+    stats = [f.stat() for f in tests_path.rglob("*") if f.is_file()]
+    return (
+        len(stats),
+        sum(st.st_size for st in stats),
+        max((st.st_mtime_ns for st in stats), default=0)
+    )
+
+def _write_tests_zip(tests_path: Path, zip_path: Path):
+    """Archive the test directory with fast, light compression"""
+    # Build beside the target and swap it in, so a download in progress keeps its file
+    fd, tmp_name = tempfile.mkstemp(dir=zip_path.parent, suffix=".zip.tmp")
+    try:
+        with os.fdopen(fd, "wb") as out_fh:
+            with zipfile.ZipFile(out_fh, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zip_file:
+                for file_path in sorted(tests_path.rglob("*")):
+                    if file_path.is_file():
+                        zip_file.write(file_path, arcname=str(file_path.relative_to(tests_path)))
+        os.replace(tmp_name, zip_path)
+    finally:
+        Path(tmp_name).unlink(missing_ok=True)
+
+async def _download_to_file(client: httpx.AsyncClient, url: str, destination: Path):
+    """Stream an HTTP download to disk"""
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        total = 0
+        with open(destination, "wb") as out_fh:
+            async for chunk in response.aiter_bytes(UPLOAD_CHUNK_SIZE):
+                total += len(chunk)
+                _check_upload_size(total)
+                if len(chunk) < INLINE_WRITE_LIMIT:
+                    out_fh.write(chunk)
+                else:
+                    await asyncio.to_thread(out_fh.write, chunk)
+
+async def _iter_file(path: Path):
+    """Yield a file's contents in upload-sized chunks"""
+    async with aiofiles.open(path, "rb") as fh:
+        while chunk := await fh.read(UPLOAD_CHUNK_SIZE):
+            yield chunk
+
+def _write_zip(files: List[str], destination: Path):
+    """Write the given files into a flat zip archive"""
+    with zipfile.ZipFile(destination, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for file in files:
+            zip_file.write(file, arcname=os.path.basename(file))
+
+def _extract_archive(fileobj, filename: str, destination: Path):
+    """Extract a zip or gzipped tar archive from an open file object"""
+    if filename.endswith('.zip'):
+        _extract_zip(fileobj, destination)
+    else:
+        # Stream mode reads the tarball sequentially without seeking
+        with tarfile.open(fileobj=fileobj, mode='r|gz') as archive:
+            archive.extractall(destination)
+
+def _create_project() -> tuple:
+    """Allocate a project id and its working directory"""
+    project_id = str(uuid.uuid4())
+    # Use absolute path to ensure we're in the right directory
+    project_path = PROJECTS_DIR / project_id
+    project_path.mkdir(parents=True, exist_ok=True)
+    return project_id, project_path
+
+def _find_cpp_files(project_path: Path) -> List[str]:
+    """Find C++ files recursively"""
+    cpp_files = []
+    stack = [str(project_path)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(CPP_EXTENSIONS) and entry.is_file():
+                    cpp_files.append(entry.path)
+    return cpp_files
+
+async def _register_project(project_id: str, project_path: Path, cpp_files: List[str],
+                            missing_detail: str = "No C++ files found", object_hashes: Iterable[str] = ()) -> dict:
+    """Analyze an ingested project and make it available to the other endpoints"""
+    if not cpp_files:
+        raise HTTPException(status_code=400, detail=missing_detail)
+    
+    print(f"Uploaded files to: {project_path}")
+    print(f"C++ files: {cpp_files}")
+    
+    # Analyze project structure
+    project_info = await test_generator.analyze_project(project_path)
+    
+    # Project info is immutable after upload, so serialize the status reply once
+    status_payload = json.dumps({
+        "project_id": project_id,
+        "status": "active",
+        "files": cpp_files,
+        "info": project_info.model_dump(mode="json")
+    }).encode()
+    
+    await active_projects.put(project_id, {
+        "id": project_id,
+        "path": project_path,
+        "files": cpp_files,
+        # Stored objects linked into the project, pruned when it is removed
+        "objects": list(object_hashes),
+        "info": project_info,
+        "status_payload": status_payload
+    })
+    
+    return {"project_id": project_id, "files": cpp_files, "info": project_info}
 
 @app.get("/")
 async def root():
@@ -45,38 +332,27 @@ async def root():
 async def upload_project(files: List[UploadFile] = File(...)):
     """Upload C++ project files"""
     try:
-        project_id = str(uuid.uuid4())
-        # Use absolute path to ensure we're in the right directory
-        base_path = Path(__file__).parent / "temp_projects"
-        project_path = base_path / project_id
-        project_path.mkdir(parents=True, exist_ok=True)
-        
-        cpp_files = []
-        for file in files:
-            if file.filename and file.filename.endswith(('.cpp', '.hpp', '.h', '.cc', '.cxx')):
-                file_path = project_path / file.filename
-                with open(file_path, "wb") as f:
-                    content = await file.read()
-                    f.write(content)
-                cpp_files.append(str(file_path))
+        project_id, project_path = _create_project()
         
-        if not cpp_files:
-            raise HTTPException(status_code=400, detail="No C++ files found")
+        uploads = [
+            (file, project_path / file.filename) for file in files
+            if file.filename and file.filename.endswith(CPP_EXTENSIONS)
+        ]
         
-        print(f"Uploaded files to: {project_path}")
-        print(f"C++ files: {cpp_files}")
+        # Write files concurrently, bounded to avoid saturating the disk
+        write_slots = asyncio.Semaphore(UPLOAD_WRITE_CONCURRENCY)
         
-        # Analyze project structure
-        project_info = await test_generator.analyze_project(project_path)
+        async def save(file: UploadFile, file_path: Path):
+            async with write_slots:
+                return await _save_upload(file, file_path)
         
-        active_projects[project_id] = {
-            "path": project_path,
-            "files": cpp_files,
-            "info": project_info
-        }
+        object_hashes = await asyncio.gather(*(save(file, file_path) for file, file_path in uploads))
+        cpp_files = [str(file_path) for _, file_path in uploads]
         
-        return {"project_id": project_id, "files": cpp_files, "info": project_info}
+        return await _register_project(project_id, project_path, cpp_files, object_hashes=object_hashes)
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in upload_project: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
@@ -84,20 +360,22 @@ async def upload_project(files: List[UploadFile] = File(...)):
 @app.post("/api/generate-tests/{project_id}")
 async def generate_tests(project_id: str, request: TestGenerationRequest):
     """Generate unit tests for the project"""
-    if project_id not in active_projects:
+    project = await active_projects.get(project_id)
+    if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    project = active_projects[project_id]
-    
     try:
         result = await test_generator.generate_tests(
             project["path"],
             project["files"],
             request.llm_model,
-            request.test_framework
+            request.test_framework,
+            # Generating again for the same project resumes groups that failed
+            run_id=project_id,
+            fast_mode=request.fast_mode
         )
         
-        return TestGenerationResponse(
+        response = TestGenerationResponse(
             project_id=project_id,
             status="success",
             generated_tests=result["tests"],
@@ -106,7 +384,7 @@ async def generate_tests(project_id: str, request: TestGenerationRequest):
         )
     
     except Exception as e:
-        return TestGenerationResponse(
+        response = TestGenerationResponse(
             project_id=project_id,
             status="error",
             error=str(e),
@@ -114,64 +392,99 @@ async def generate_tests(project_id: str, request: TestGenerationRequest):
             coverage_report=None,
             build_logs=[]
         )
+    
+    # Serialize with pydantic-core directly rather than FastAPI's generic encoder
+    return Response(content=response.model_dump_json(), media_type="application/json")
 
 @app.get("/api/project-status/{project_id}")
 async def get_project_status(project_id: str):
     """Get project status and information"""
-    if project_id not in active_projects:
+    project = await active_projects.get(project_id)
+    if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    project = active_projects[project_id]
-    return {
-        "project_id": project_id,
-        "status": "active",
-        "files": project["files"],
-        "info": project["info"]
-    }
+    return Response(content=project["status_payload"], media_type="application/json")
 
 @app.get("/api/download-tests/{project_id}")
 async def download_tests(project_id: str):
     """Download generated test files"""
-    if project_id not in active_projects:
+    project = await active_projects.get(project_id)
+    if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    project = active_projects[project_id]
     tests_path = project["path"] / "tests"
     
     if not tests_path.exists():
         raise HTTPException(status_code=404, detail="No tests generated yet")
     
-    # Create a zip file with all test files
+    # Create a zip file with all test files, reusing it while the tests are unchanged
     zip_path = project["path"] / "tests.zip"
-    shutil.make_archive(str(zip_path.with_suffix('')), 'zip', str(tests_path))
+    fingerprint = await asyncio.to_thread(_tests_fingerprint, tests_path)
+    if project.get("zip_fp") != fingerprint or not zip_path.exists():
+        await asyncio.to_thread(_write_tests_zip, tests_path, zip_path)
+        project["zip_fp"] = fingerprint
     
+    # Passing the stat result saves Starlette a second stat of the archive
     return FileResponse(
         path=str(zip_path),
         filename="generated_tests.zip",
-        media_type="application/zip"
+        media_type="application/zip",
+        stat_result=os.stat(zip_path)
     )
 
 @app.delete("/api/project/{project_id}")
-async def delete_project(project_id: str):
+async def delete_project(project_id: str, background_tasks: BackgroundTasks):
     """Clean up project files"""
-    if project_id in active_projects:
-        project_path = active_projects[project_id]["path"]
-        if project_path.exists():
-            shutil.rmtree(project_path)
-        del active_projects[project_id]
+    project = await active_projects.remove(project_id)
+    if project is not None:
+        # Remove the tree after responding; it can hold thousands of files
+        background_tasks.add_task(_remove_project_files, project["path"], project["objects"])
+        background_tasks.add_task(_delete_checkpoints, project)
     
     return {"message": "Project cleaned up"}
 
 @app.get("/api/system-requirements")
 async def check_system_requirements():
     """Check if required build tools are available"""
-    requirements = test_generator.check_system_requirements()
+    requirements = await test_generator.check_system_requirements()
     return {
         "requirements": requirements,
         "all_available": all(requirements.values()),
         "missing_tools": [tool for tool, available in requirements.items() if not available]
     }
 
+async def _publish_release(repo_url: str, access_token: str, project_id: str, zip_path: Path):
+    """Create a GitHub release and attach the project archive to it"""
+    headers = {
+        "Authorization": f"token {access_token}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+    
+    async with httpx.AsyncClient(timeout=30) as client:
+        # Create a release on GitHub
+        release_response = await client.post(
+            f"{repo_url}/releases",
+            headers=headers,
+            json={"tag_name": project_id, "name": f"Release {project_id}", "body": "Automated release"}
+        )
+        
+        release_response.raise_for_status()
+        upload_url = release_response.json()["upload_url"].split("{")[0]
+        
+        # Upload the zip file
+        upload_headers = {
+            **headers,
+            "Content-Type": "application/zip",
+            "Content-Length": str(zip_path.stat().st_size)
+        }
+        upload_response = await client.put(
+            f"{upload_url}?name={project_id}.zip",
+            headers=upload_headers,
+            content=_iter_file(zip_path)
+        )
+        
+        upload_response.raise_for_status()
+
 @app.post("/api/upload-github", status_code=201)
 async def upload_github(request: Request):
     """Upload project to GitHub repository"""
@@ -184,44 +497,19 @@ async def upload_github(request: Request):
         if not all([repo_url, access_token, project_id]):
             raise HTTPException(status_code=400, detail="Missing fields in request")
         
-        if project_id not in active_projects:
+        project = await active_projects.get(project_id)
+        if project is None:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        project = active_projects[project_id]
-        project_path = project["path"]
-        
-        # Create a zip file of the project
-        zip_buffer = BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for file in project["files"]:
-                zip_file.write(file, arcname=os.path.basename(file))
-        
-        zip_buffer.seek(0)
-        
-        # Upload to GitHub
-        headers = {
-            "Authorization": f"token {access_token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
-        
-        # Create a release on GitHub
-        release_response = requests.post(
-            f"{repo_url}/releases",
-            headers=headers,
-            json={"tag_name": project_id, "name": f"Release {project_id}", "body": "Automated release"}
-        )
-        
-        release_response.raise_for_status()
-        upload_url = release_response.json()["upload_url"].split("{")[0]
-        
-        # Upload the zip file
-        upload_response = requests.put(
-            f"{upload_url}?name={project_id}.zip",
-            headers=headers,
-            data=zip_buffer.getvalue()
-        )
+        # Create a zip file of the project on disk
+        with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as tmp:
+            zip_path = Path(tmp.name)
         
-        upload_response.raise_for_status()
+        try:
+            await asyncio.to_thread(_write_zip, project["files"], zip_path)
+            await _publish_release(repo_url, access_token, project_id, zip_path)
+        finally:
+            zip_path.unlink(missing_ok=True)
         
         return {"message": "Project uploaded to GitHub", "project_id": project_id}
     
@@ -232,47 +520,83 @@ async def upload_github(request: Request):
 async def upload_zip(file: UploadFile = File(...)):
     """Upload a zip file containing the project"""
     try:
-        project_id = str(uuid.uuid4())
-        # Use absolute path to ensure we're in the right directory
-        base_path = Path(__file__).parent / "temp_projects"
-        project_path = base_path / project_id
-        project_path.mkdir(parents=True, exist_ok=True)
+        project_id, project_path = _create_project()
         
         # Save the uploaded zip file
         zip_path = project_path / file.filename
-        with open(zip_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        object_hash = await _save_upload(file, zip_path)
         
         # Extract the zip file
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(project_path)
+        await asyncio.to_thread(_extract_zip, zip_path, project_path)
         
-        # Get the list of extracted files
-        extracted_files = [f for f in project_path.rglob("*") if f.is_file()]
-        cpp_files = [str(f) for f in extracted_files if f.suffix in ['.cpp', '.hpp', '.h', '.cc', '.cxx']]
-        
-        if not cpp_files:
-            raise HTTPException(status_code=400, detail="No C++ files found in the zip")
-        
-        print(f"Uploaded and extracted files to: {project_path}")
-        print(f"C++ files: {cpp_files}")
-        
-        # Analyze project structure
-        project_info = await test_generator.analyze_project(project_path)
-        
-        active_projects[project_id] = {
-            "path": project_path,
-            "files": cpp_files,
-            "info": project_info
-        }
-        
-        return {"project_id": project_id, "files": cpp_files, "info": project_info}
+        cpp_files = await asyncio.to_thread(_find_cpp_files, project_path)
+        return await _register_project(project_id, project_path, cpp_files, "No C++ files found in the zip", [object_hash])
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in upload_zip: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+async def _resolve_head_commit(client: httpx.AsyncClient, owner: str, repo: str) -> Optional[str]:
+    """Return the SHA of the default branch head, or None if it can't be resolved"""
+    try:
+        response = await client.get(
+            f"https://api.github.com/repos/{owner}/{repo}/commits/HEAD",
+            headers={"Accept": "application/vnd.github.sha"}
+        )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        print(f"Could not resolve {owner}/{repo} HEAD commit: {e}")
+        return None
+    
+    commit_sha = response.text.strip()
+    return commit_sha if commit_sha.isalnum() else None
+
+async def _fetch_github_archive(client: httpx.AsyncClient, owner: str, repo: str, project_id: str) -> tuple:
+    """Download a repository zipball, reusing a cached archive of the same commit"""
+    commit_sha = await _resolve_head_commit(client, owner, repo)
+    if commit_sha is None:
+        archive_path = PROJECTS_DIR / f"{project_id}.zip"
+        await _download_to_file(client, f"https://api.github.com/repos/{owner}/{repo}/zipball", archive_path)
+        return archive_path, False
+    
+    archive_path = GITHUB_CACHE_DIR / f"{owner}_{repo}_{commit_sha}.zip"
+    try:
+        # Mark the archive as recently used for the cache size limit
+        os.utime(archive_path)
+    except FileNotFoundError:
+        GITHUB_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        partial_path = GITHUB_CACHE_DIR / f"{project_id}.part"
+        try:
+            await _download_to_file(
+                client, f"https://api.github.com/repos/{owner}/{repo}/zipball/{commit_sha}", partial_path
+            )
+            os.replace(partial_path, archive_path)
+        finally:
+            partial_path.unlink(missing_ok=True)
+    
+    return archive_path, True
+
+def _prune_github_cache():
+    """Drop the least recently used archives once the cache outgrows its size limit"""
+    try:
+        with os.scandir(GITHUB_CACHE_DIR) as entries:
+            archives = [(entry.stat(), entry.path) for entry in entries if entry.name.endswith('.zip')]
+    except OSError:
+        return
+    
+    total = sum(st.st_size for st, _ in archives)
+    archives.sort(key=lambda archive: archive[0].st_mtime)
+    for st, path in archives:
+        if total <= GITHUB_CACHE_MAX_BYTES:
+            break
+        try:
+            os.unlink(path)
+            total -= st.st_size
+        except OSError:
+            pass
+
 # Schema for GitHub upload request
 class GitHubUploadRequest(BaseModel):
     github_url: str
@@ -298,43 +622,26 @@ async def upload_from_github(request: GitHubUploadRequest):
         
         owner, repo = parts[0], parts[1]
         
-        # Download repository as zip
-        download_url = f"https://api.github.com/repos/{owner}/{repo}/zipball"
-        
-        project_id = str(uuid.uuid4())
-        base_path = Path(__file__).parent / "temp_projects"
-        project_path = base_path / project_id
-        project_path.mkdir(parents=True, exist_ok=True)
-        
-        # Download the repository
-        response = requests.get(download_url, timeout=30)
-        response.raise_for_status()
-        
-        # Extract zip file
-        with zipfile.ZipFile(BytesIO(response.content)) as zip_file:
-            zip_file.extractall(project_path)
+        project_id, project_path = _create_project()
         
-        # Find C++ files recursively
-        cpp_files = []
-        for file_path in project_path.rglob('*'):
-            if file_path.is_file() and file_path.suffix in ['.cpp', '.hpp', '.h', '.cc', '.cxx', '.c++']:
-                cpp_files.append(str(file_path))
+        # Download the repository as zip to disk, then extract it
+        async with httpx.AsyncClient(timeout=30, follow_redirects=True) as client:
+            archive_path, cached = await _fetch_github_archive(client, owner, repo, project_id)
         
-        if not cpp_files:
-            raise HTTPException(status_code=400, detail="No C++ files found in repository")
+        try:
+            await asyncio.to_thread(_extract_zip, archive_path, project_path)
+        finally:
+            if cached:
+                await asyncio.to_thread(_prune_github_cache)
+            else:
+                archive_path.unlink(missing_ok=True)
         
-        # Analyze project structure
-        project_info = await test_generator.analyze_project(project_path)
-        
-        active_projects[project_id] = {
-            "path": project_path,
-            "files": cpp_files,
-            "info": project_info
-        }
-        
-        return {"project_id": project_id, "files": cpp_files, "info": project_info}
+        cpp_files = await asyncio.to_thread(_find_cpp_files, project_path)
+        return await _register_project(project_id, project_path, cpp_files, "No C++ files found in repository")
     
-    except requests.exceptions.RequestException as e:
+    except HTTPException:
+        raise
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=400, detail=f"Failed to download repository: {str(e)}")
     except Exception as e:
         print(f"Error in upload_from_github: {e}")
@@ -344,48 +651,35 @@ async def upload_from_github(request: GitHubUploadRequest):
 async def upload_zip_project(zip_file: UploadFile = File(...)):
     """Upload C++ project from zip/tar.gz file"""
     try:
-        project_id = str(uuid.uuid4())
-        base_path = Path(__file__).parent / "temp_projects"
-        project_path = base_path / project_id
-        project_path.mkdir(parents=True, exist_ok=True)
-        
-        # Read the uploaded file
-        content = await zip_file.read()
+        project_id, project_path = _create_project()
         
-        # Extract based on file extension
-        if zip_file.filename.endswith('.zip'):
-            with zipfile.ZipFile(BytesIO(content)) as archive:
-                archive.extractall(project_path)
-        elif zip_file.filename.endswith(('.tar.gz', '.tgz')):
-            with tarfile.open(fileobj=BytesIO(content), mode='r:gz') as archive:
-                archive.extractall(project_path)
-        else:
+        # Extract straight from the upload spool based on file extension
+        if not zip_file.filename.endswith(('.zip', '.tar.gz', '.tgz')):
             raise HTTPException(status_code=400, detail="Unsupported archive format")
+        # Chunked requests carry no Content-Length for the middleware to check
+        _check_upload_size(zip_file.size or 0)
         
-        # Find C++ files recursively
-        cpp_files = []
-        for file_path in project_path.rglob('*'):
-            if file_path.is_file() and file_path.suffix in ['.cpp', '.hpp', '.h', '.cc', '.cxx', '.c++']:
-                cpp_files.append(str(file_path))
-        
-        if not cpp_files:
-            raise HTTPException(status_code=400, detail="No C++ files found in archive")
-        
-        # Analyze project structure
-        project_info = await test_generator.analyze_project(project_path)
+        await asyncio.to_thread(_extract_archive, zip_file.file, zip_file.filename, project_path)
         
-        active_projects[project_id] = {
-            "path": project_path,
-            "files": cpp_files,
-            "info": project_info
-        }
-        
-        return {"project_id": project_id, "files": cpp_files, "info": project_info}
+        cpp_files = await asyncio.to_thread(_find_cpp_files, project_path)
+        return await _register_project(project_id, project_path, cpp_files, "No C++ files found in archive")
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in upload_zip_project: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # uvloop and httptools are picked up automatically when uvicorn[standard] is
+    # installed. Project state is per process, so only raise the worker count
+    # behind sticky routing.
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="auto",
+        http="auto",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1"))
+    )
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional, Dict, Any
 from enum import Enum
 
@@ -19,8 +19,13 @@ class TestGenerationRequest(BaseModel):
     coverage_threshold: float = 0.8
     generate_mocks: bool = True
     include_integration_tests: bool = False
+    # Generate and self-review tests in one LLM call; None decides per translation unit by size
+    fast_mode: Optional[bool] = None
 
+# Result models are built once by the backend and never mutated afterwards
 class GeneratedTest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     filename: str
     content: str
     source_file: str
@@ -28,6 +33,8 @@ class GeneratedTest(BaseModel):
     coverage_estimate: float
 
 class CoverageReport(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     overall_coverage: float
     file_coverage: Dict[str, float]
     function_coverage: Dict[str, float]
@@ -35,12 +42,16 @@ class CoverageReport(BaseModel):
     total_lines: int
 
 class BuildLog(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     level: str  # info, warning, error
     message: str
     file: Optional[str] = None
     line: Optional[int] = None
 
 class TestGenerationResponse(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     project_id: str
     status: str
     generated_tests: List[GeneratedTest]
@@ -49,6 +60,8 @@ class TestGenerationResponse(BaseModel):
     error: Optional[str] = None
 
 class ProjectInfo(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     name: str
     files: List[str]
     classes: List[str]
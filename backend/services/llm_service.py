@@ -2,34 +2,262 @@ import yaml
 from typing import Dict, Any, Optional, List
 from pathlib import Path
 import os
-from langchain.schema import HumanMessage, SystemMessage
+import re
+import asyncio
+import json
+import uuid
+from functools import cached_property
+from collections import OrderedDict
+import xxhash
+import httpx
+import aiosqlite
+from openai import RateLimitError, APIConnectionError, InternalServerError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+from langchain.schema import BaseMessage, HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
-from langgraph.graph.message import add_messages
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from typing_extensions import TypedDict, Annotated
 
 from dotenv import load_dotenv
 
+
+# httpx needs the h2 package (the httpx[http2] extra) to speak HTTP/2
+try:
+    import h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Prefer the libyaml-backed dumper when PyYAML was built with it
+try:
+    from yaml import CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeDumper as YamlDumper
+
+# Variables already set in the environment take precedence over .env
+load_dotenv()
+
+# LangSmith tracing without an API key only adds failing uploads to every node;
+# when it is configured, let the tracer flush in the background
+if not (os.getenv("LANGSMITH_API_KEY") or os.getenv("LANGCHAIN_API_KEY")):
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    os.environ["LANGSMITH_TRACING"] = "false"
+os.environ.setdefault("LANGCHAIN_CALLBACKS_BACKGROUND", "true")
+
+# Maximum number of LLM responses kept in the in-memory cache
+RESPONSE_CACHE_SIZE = 256
+
+# Retry transient provider failures (rate limits, 5xx, dropped connections, timeouts)
+# with jittered exponential backoff
+_retry_llm = retry(
+    wait=wait_random_exponential(min=1, max=30),
+    stop=stop_after_attempt(6),
+    retry=retry_if_exception_type((RateLimitError, APIConnectionError, InternalServerError, httpx.TimeoutException)),
+    reraise=True,
+)
+
+# Output token budget bounds and the step they are rounded up to, so only a
+# handful of distinct chains get built
+MAX_OUTPUT_TOKENS = 4000
+MIN_OUTPUT_TOKENS = 512
+OUTPUT_TOKEN_STEP = 512
+
+# Generation writes several tests per function, so its replies outgrow the
+# prompt; these chains always get the full budget
+FULL_BUDGET_CHAINS = ("initial", "fast")
+
+# SQLite database holding workflow checkpoints, kept out of the working tree
+CHECKPOINT_DB = Path(os.getenv(
+    "TESTGEN_CHECKPOINT_DB",
+    Path(os.getenv("TESTGEN_CACHE_DIR", Path.home() / ".cache" / "testgen")) / "checkpoints.db"
+))
+
+# Translation units with at most this many characters of source use the
+# single-call fast mode unless the caller chooses
+FAST_MODE_MAX_CHARS = int(os.getenv("TESTGEN_FAST_MODE_MAX_CHARS", "8000"))
+
+# Upper bound for the LLM health check
+PROBE_TIMEOUT_SECONDS = 5.0
+
+# Number of messages kept in the workflow state
+MAX_STATE_MESSAGES = 20
+
+# One test file block in an LLM response
+_BLOCK_RE = re.compile(
+    r"===TEST_FILE_START===\s*filename:\s*(?P<name>[^\n]+)\s*content:\s*(?P<body>.*?)===TEST_FILE_END===",
+    re.DOTALL,
+)
+
+# Header named by an #include directive
+_INCLUDE_RE = re.compile(r'#include\s*[<"]([^>"]+)[>"]')
+
+def _read_text(path: str) -> str:
+    """Read a UTF-8 source file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def _max_tokens_for(inputs: Dict[str, Any]) -> int:
+    """Scale the output budget with the prompt size (about 4 characters per token)"""
+    input_tokens = sum(len(value) for value in inputs.values() if isinstance(value, str)) // 4
+    bucket = -(-2 * input_tokens // OUTPUT_TOKEN_STEP) * OUTPUT_TOKEN_STEP
+    return min(MAX_OUTPUT_TOKENS, max(MIN_OUTPUT_TOKENS, bucket))
+
+def _is_truncated(response: str) -> bool:
+    """Whether a reply stopped inside a test file block"""
+    return response.count("===TEST_FILE_START===") > response.count("===TEST_FILE_END===")
+
+def last_n_messages(existing: Optional[List[BaseMessage]], new: List[BaseMessage]) -> List[BaseMessage]:
+    """Append node messages to the workflow state, keeping only the most recent ones"""
+    return ((existing or []) + new)[-MAX_STATE_MESSAGES:]
+
 # State for LangGraph workflow
 class TestGenerationState(TypedDict):
     source_code: Dict[str, str]
     framework: str
     instructions: Dict[str, Any]
+    instructions_yaml: str
     generated_tests: Dict[str, str]
     build_logs: List[str]
     iteration_count: int
-    messages: Annotated[List[HumanMessage | SystemMessage], add_messages]
+    fast_mode: bool
+    messages: Annotated[List[BaseMessage], last_n_messages]
+
+# Prompt templates for the workflow nodes, parsed once at import. System
+# prompts carry only static text so the provider can reuse its cached prefix;
+# human messages start with the fixed per-stage instructions and end with the
+# per-request data.
+INITIAL_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are an expert C++ developer specializing in unit testing. 
+    Generate high-quality, comprehensive unit tests following best practices.
+    
+    Generate tests for the provided C++ code following these requirements:
+    - Use the testing framework named in the request
+    - Include edge cases and boundary conditions
+    - Create tests for both success and failure scenarios
+    - Follow C++ testing best practices
+    - Include necessary headers and dependencies
+    
+    Return the tests in the following format:
+    ===TEST_FILE_START===
+    filename: test_[source_filename].cpp
+    content: [test code here]
+    ===TEST_FILE_END===
+    """),
+    ("human", "INSTRUCTIONS:\n{instructions}\n\nFRAMEWORK: {framework}\n\nSOURCE CODE:\n{source_code}")
+])
+
+# Single-call variant of generate + refine used in fast mode
+FAST_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are an expert C++ developer specializing in unit testing. 
+    Generate high-quality, comprehensive unit tests following best practices.
+    
+    Generate tests for the provided C++ code following these requirements:
+    - Use the testing framework named in the request
+    - Include edge cases and boundary conditions
+    - Create tests for both success and failure scenarios
+    - Follow C++ testing best practices
+    - Include necessary headers and dependencies
+    
+    Before answering, draft the tests and review them as a senior code reviewer would:
+    remove duplicates, add missing includes, improve assertions and fix any issues.
+    Output only the final reviewed tests, not the draft or the review.
+    
+    Return the tests in the following format:
+    ===TEST_FILE_START===
+    filename: test_[source_filename].cpp
+    content: [test code here]
+    ===TEST_FILE_END===
+    """),
+    ("human", "INSTRUCTIONS:\n{instructions}\n\nFRAMEWORK: {framework}\n\nSOURCE CODE:\n{source_code}")
+])
+
+REFINE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a senior code reviewer specializing in C++ testing. 
+    Improve the quality and correctness of the provided tests.
+    
+    Focus on:
+    1. Removing duplicates
+    2. Adding missing includes
+    3. Improving test quality
+    4. Fixing any issues
+    
+    Return the refined tests in the same format as the input.
+    """),
+    ("human", "INSTRUCTIONS:\n{instructions}\n\nEXISTING TESTS:\n{test_files}\n\nBUILD LOGS:\n{build_logs}")
+])
+
+FIX_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a C++ build engineer. Fix compilation errors while maintaining test functionality.
+    
+    Analyze the build logs and fix:
+    - Syntax errors and missing includes
+    - Linking issues and library dependencies
+    - Ensure compatibility with C++17 standard
+    - Maintain test functionality while fixing issues
+    
+    Return the corrected test files.
+    """),
+    ("human", """INSTRUCTIONS:
+{instructions}
+
+SOURCE FILES:
+{source_files}
+
+TEST FILES:
+{test_files}
+
+BUILD LOGS:
+{build_logs}
+
+Fix the compilation errors and issues. Return the corrected test files.""")
+])
+
+# Node prompts by chain name
+NODE_PROMPTS = {
+    "initial": INITIAL_PROMPT,
+    "fast": FAST_PROMPT,
+    "refine": REFINE_PROMPT,
+    "fix": FIX_PROMPT,
+}
+
 
 class LLMService:
     def __init__(self):
-        # Initialize GitHub Models (using OpenAI API format)
-        load_dotenv()
+        # GitHub Models configuration (OpenAI API format); clients are built on first use
         self.github_api_key = os.getenv("GITHUB_TOKEN")
         self.github_base_url = os.getenv("ENDPOINT")
         self.model = os.getenv("MODEL_NAME")
         
+        # Initialize output parser
+        self.output_parser = StrOutputParser()
+        
+        # Node chains keyed by (prompt name, max_tokens bucket)
+        self._chains: Dict[tuple, Any] = {}
+        
+        # Exact-match LRU cache of chain responses
+        self._response_cache: "OrderedDict[str, str]" = OrderedDict()
+        
+        # Checkpoints let a failed workflow run resume instead of starting over;
+        # the SQLite saver needs a running loop, so it is opened on first use
+        self.checkpointer: Optional[AsyncSqliteSaver] = None
+        self._checkpointer_lock = asyncio.Lock()
+        
+        # Bound concurrent LLM requests to stay under the provider's rate limits
+        self.llm_slots = asyncio.Semaphore(int(os.getenv("LLM_MAX_CONCURRENCY", "8")))
+        
+        self.prompts_dir = Path("prompts")
+        self.prompts_dir.mkdir(exist_ok=True)
+        
+        # Load YAML instruction templates
+        self.load_instruction_templates()
+    
+    @cached_property
+    def llm(self) -> ChatOpenAI:
+        """LangChain chat model for GitHub Models, created on first use"""
         # Validate required environment variables
         if not self.model:
             raise ValueError("MODEL_NAME environment variable is required")
@@ -38,26 +266,51 @@ class LLMService:
         if not self.github_base_url:
             raise ValueError("ENDPOINT environment variable is required")
         
-        # Initialize LangChain LLM with GitHub Models
-        self.llm = ChatOpenAI(
+        # One pooled client shared by every concurrent LLM request, over HTTP/2 when available
+        self._http_client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            timeout=httpx.Timeout(120.0, connect=10.0),
+        )
+        
+        return ChatOpenAI(
             model=self.model,  # GitHub Models available model
             api_key=self.github_api_key,
             base_url=self.github_base_url,
             temperature=0.1,
-            max_tokens=4000,
+            max_tokens=MAX_OUTPUT_TOKENS,
+            streaming=True,
+            # _retry_llm is the only retry policy; client retries would multiply its attempts
+            max_retries=0,
+            http_async_client=self._http_client,
         )
-        
-        # Initialize output parser
-        self.output_parser = StrOutputParser()
-        
-        # Create the LangGraph workflow
-        self.workflow = self._create_workflow()
-        
-        self.prompts_dir = Path("prompts")
-        self.prompts_dir.mkdir(exist_ok=True)
-        
-        # Load YAML instruction templates
-        self.load_instruction_templates()
+    
+    @cached_property
+    def _probe_llm(self):
+        """Shares the chat model's HTTP client but asks for only a few tokens"""
+        return self.llm.bind(max_tokens=4, temperature=0)
+    
+    @cached_property
+    def workflow(self):
+        """Compiled LangGraph workflow, built on first use"""
+        return self._create_workflow()
+    
+    def _chain(self, chain_name: str, max_tokens: int):
+        """Return the node chain for a prompt and output budget, composed once per pair"""
+        key = (chain_name, max_tokens)
+        if key not in self._chains:
+            self._chains[key] = NODE_PROMPTS[chain_name] | self.llm.bind(max_tokens=max_tokens) | self.output_parser
+        return self._chains[key]
+    
+    async def _get_workflow(self):
+        """Open the checkpoint database if needed and return the compiled workflow"""
+        async with self._checkpointer_lock:
+            if self.checkpointer is None:
+                CHECKPOINT_DB.parent.mkdir(parents=True, exist_ok=True)
+                conn = await aiosqlite.connect(CHECKPOINT_DB)
+                self.checkpointer = AsyncSqliteSaver(conn)
+                await self.checkpointer.setup()
+        return self.workflow
     
     def _create_workflow(self) -> StateGraph:
         """Create LangGraph workflow for test generation"""
@@ -70,160 +323,149 @@ class LLMService:
         
         # Add edges
         workflow.add_edge(START, "generate_initial_tests")
-        workflow.add_edge("generate_initial_tests", "refine_tests")
+        workflow.add_conditional_edges(
+            "generate_initial_tests",
+            self._route_after_generation,
+            {END: END, "fix_build_issues": "fix_build_issues", "refine_tests": "refine_tests"}
+        )
         workflow.add_edge("refine_tests", END)
         workflow.add_edge("fix_build_issues", "refine_tests")
         
-        return workflow.compile()
+        return workflow.compile(checkpointer=self.checkpointer)
     
-    async def _generate_initial_tests_node(self, state: TestGenerationState) -> TestGenerationState:
+    def _route_after_generation(self, state: TestGenerationState) -> str:
+        """Send tests with build errors to the fixer, otherwise refine or finish"""
+        if state.get("build_logs"):
+            return "fix_build_issues"
+        if state.get("fast_mode"):
+            return END
+        return "refine_tests"
+    
+    async def _generate_initial_tests_node(self, state: TestGenerationState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
         """Node for generating initial tests"""
-        # Create prompt template
-        prompt_template = ChatPromptTemplate.from_messages([
-            ("system", """You are an expert C++ developer specializing in unit testing. 
-            Generate high-quality, comprehensive unit tests following best practices.
-            
-            Instructions: {instructions}
-            
-            Generate tests for the provided C++ code following these requirements:
-            - Use {framework} testing framework
-            - Include edge cases and boundary conditions
-            - Create tests for both success and failure scenarios
-            - Follow C++ testing best practices
-            - Include necessary headers and dependencies
-            
-            Return the tests in the following format:
-            ===TEST_FILE_START===
-            filename: test_[source_filename].cpp
-            content: [test code here]
-            ===TEST_FILE_END===
-            """),
-            ("human", "SOURCE CODE:\n{source_code}")
-        ])
-        
         # Format source code
         formatted_source = self._format_source_code(state["source_code"])
         
-        # Create chain
-        chain = prompt_template | self.llm | self.output_parser
-        
         # Generate response
-        response = await chain.ainvoke({
-            "instructions": yaml.dump(state["instructions"], default_flow_style=False),
+        # Fast mode generates and self-reviews in one call instead of two
+        chain_name = "fast" if state.get("fast_mode") else "initial"
+        response = await self._cached_invoke(chain_name, {
+            "instructions": state["instructions_yaml"],
             "framework": state["framework"],
             "source_code": formatted_source
-        })
+        }, config)
         
         # Parse response
         test_files = self._parse_test_response(response)
         
-        # Update state
-        state["generated_tests"] = test_files["tests"]
-        state["messages"] = [
-            SystemMessage(content="Generated initial unit tests"),
-            HumanMessage(content=f"Generated {len(test_files['tests'])} test files")
-        ]
-        
-        return state
+        # Return state update
+        return {
+            "generated_tests": test_files["tests"],
+            "messages": [
+                SystemMessage(content="Generated initial unit tests"),
+                HumanMessage(content=f"Generated {len(test_files['tests'])} test files")
+            ]
+        }
     
-    async def _refine_tests_node(self, state: TestGenerationState) -> TestGenerationState:
+    async def _refine_tests_node(self, state: TestGenerationState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
         """Node for refining tests"""
-        prompt_template = ChatPromptTemplate.from_messages([
-            ("system", """You are a senior code reviewer specializing in C++ testing. 
-            Improve the quality and correctness of the provided tests.
-            
-            Instructions: {instructions}
-            
-            Focus on:
-            1. Removing duplicates
-            2. Adding missing includes
-            3. Improving test quality
-            4. Fixing any issues
-            
-            Return the refined tests in the same format as the input.
-            """),
-            ("human", "EXISTING TESTS:\n{test_files}\n\nBUILD LOGS:\n{build_logs}")
-        ])
-        
-        # Format test files
-        formatted_tests = self._format_test_files(state["generated_tests"])
-        
-        # Create chain
-        chain = prompt_template | self.llm | self.output_parser
         
-        # Generate response
-        response = await chain.ainvoke({
-            "instructions": yaml.dump(state["instructions"], default_flow_style=False),
-            "test_files": formatted_tests,
-            "build_logs": "\n".join(state.get("build_logs", []))
-        })
-        
-        # Parse response
-        refined_tests = self._parse_test_response(response)
-        
-        # Update state
-        state["generated_tests"] = refined_tests["tests"]
-        state["messages"].extend([
-            SystemMessage(content="Refined unit tests"),
-            HumanMessage(content=f"Refined {len(refined_tests['tests'])} test files")
-        ])
-        
-        return state
+        build_logs = "\n".join(state.get("build_logs", []))
+        
+        # Refine each test file in its own request so responses decode in parallel
+        test_items = list(state["generated_tests"].items())
+        responses = await asyncio.gather(*(
+            self._cached_invoke("refine", {
+                "instructions": state["instructions_yaml"],
+                "test_files": self._format_test_files({filename: content}),
+                "build_logs": build_logs
+            }, config)
+            for filename, content in test_items
+        ))
+        
+        # Parse responses, keeping the original file if a response has none
+        refined_tests = {"tests": {}}
+        for (filename, content), response in zip(test_items, responses):
+            refined_tests["tests"].update(self._parse_test_response(response)["tests"] or {filename: content})
+        
+        # Return state update
+        return {
+            "generated_tests": refined_tests["tests"],
+            "messages": [
+                SystemMessage(content="Refined unit tests"),
+                HumanMessage(content=f"Refined {len(refined_tests['tests'])} test files")
+            ]
+        }
     
-    async def _fix_build_issues_node(self, state: TestGenerationState) -> TestGenerationState:
+    async def _fix_build_issues_node(self, state: TestGenerationState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
         """Node for fixing build issues"""
-        prompt_template = ChatPromptTemplate.from_messages([
-            ("system", """You are a C++ build engineer. Fix compilation errors while maintaining test functionality.
-            
-            Instructions: {instructions}
-            
-            Analyze the build logs and fix:
-            - Syntax errors and missing includes
-            - Linking issues and library dependencies
-            - Ensure compatibility with C++17 standard
-            - Maintain test functionality while fixing issues
-            
-            Return the corrected test files.
-            """),
-            ("human", """SOURCE FILES:
-{source_files}
-
-TEST FILES:
-{test_files}
-
-BUILD LOGS:
-{build_logs}
-
-Fix the compilation errors and issues. Return the corrected test files.""")
-        ])
         
-        # Format files
-        formatted_source = self._format_source_code(state["source_code"])
-        formatted_tests = self._format_test_files(state["generated_tests"])
-        
-        # Create chain
-        chain = prompt_template | self.llm | self.output_parser
-        
-        # Generate response
-        response = await chain.ainvoke({
-            "instructions": yaml.dump(state["instructions"], default_flow_style=False),
-            "source_files": formatted_source,
-            "test_files": formatted_tests,
-            "build_logs": "\n".join(state["build_logs"])
-        })
-        
-        # Parse response
-        fixed_tests = self._parse_test_response(response)
-        
-        # Update state
-        state["generated_tests"] = fixed_tests["tests"]
-        state["iteration_count"] = state.get("iteration_count", 0) + 1
-        state["messages"].extend([
-            SystemMessage(content="Fixed build issues"),
-            HumanMessage(content=f"Fixed {len(fixed_tests['tests'])} test files")
-        ])
-        
-        return state
+        build_logs = "\n".join(state["build_logs"])
+        
+        # Fix each test file in its own request, sending only the sources it includes
+        test_items = list(state["generated_tests"].items())
+        responses = await asyncio.gather(*(
+            self._cached_invoke("fix", {
+                "instructions": state["instructions_yaml"],
+                "source_files": self._format_source_code(self._sources_for_test(content, state["source_code"])),
+                "test_files": self._format_test_files({filename: content}),
+                "build_logs": build_logs
+            }, config)
+            for filename, content in test_items
+        ))
+        
+        # Parse responses, keeping the original file if a response has none
+        fixed_tests = {"tests": {}}
+        for (filename, content), response in zip(test_items, responses):
+            fixed_tests["tests"].update(self._parse_test_response(response)["tests"] or {filename: content})
+        
+        # Return state update
+        return {
+            "generated_tests": fixed_tests["tests"],
+            "iteration_count": state.get("iteration_count", 0) + 1,
+            "messages": [
+                SystemMessage(content="Fixed build issues"),
+                HumanMessage(content=f"Fixed {len(fixed_tests['tests'])} test files")
+            ]
+        }
+    
+    async def _cached_invoke(self, chain_name: str, inputs: Dict[str, Any], config: Optional[RunnableConfig] = None) -> str:
+        """Run a node chain, reusing the response for identical inputs"""
+        use_cache = (config or {}).get("configurable", {}).get("cache", True)
+        key = xxhash.xxh3_128_hexdigest(
+            json.dumps([chain_name, self.model, self.llm.temperature, inputs], sort_keys=True).encode()
+        )
+        if use_cache and key in self._response_cache:
+            self._response_cache.move_to_end(key)
+            return self._response_cache[key]
+        
+        max_tokens = MAX_OUTPUT_TOKENS if chain_name in FULL_BUDGET_CHAINS else _max_tokens_for(inputs)
+        async with self.llm_slots:
+            response = await self._stream_response(self._chain(chain_name, max_tokens), inputs, config)
+        if _is_truncated(response) and max_tokens < MAX_OUTPUT_TOKENS:
+            # The reply ran out of budget mid-file; retry once with the full budget
+            async with self.llm_slots:
+                response = await self._stream_response(self._chain(chain_name, MAX_OUTPUT_TOKENS), inputs, config)
+        if _is_truncated(response):
+            print(f"{chain_name} reply hit the output token limit, its last test file is dropped")
+        
+        self._response_cache[key] = response
+        if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+            self._response_cache.popitem(last=False)
+        return response
+    
+    @_retry_llm
+    async def _stream_response(self, chain, inputs: Dict[str, Any], config: Optional[RunnableConfig] = None) -> str:
+        """Stream a chain's output, forwarding tokens to any callbacks in config"""
+        chunks = []
+        async for chunk in chain.astream(inputs, config=config):
+            chunks.append(chunk)
+        return "".join(chunks)
+    
+    @_retry_llm
+    async def _invoke_with_retry(self, runnable, inputs: Any, config: Optional[RunnableConfig] = None) -> Any:
+        """Invoke a runnable, retrying transient provider failures"""
+        return await runnable.ainvoke(inputs, config=config)
     
     def load_instruction_templates(self):
         """Load YAML instruction templates for different stages"""
@@ -273,6 +515,12 @@ Fix the compilation errors and issues. Return the corrected test files.""")
             ],
             "output_format": "fixed_cpp_code"
         }
+        
+        # Serialize once; the templates are static and every LLM call embeds them
+        self.instructions_yaml = {
+            stage: yaml.dump(instructions, Dumper=YamlDumper, default_flow_style=False)
+            for stage, instructions in self.instructions.items()
+        }
     
     async def call_ollama(self, model: str, prompt: str, system_prompt: str = None) -> str:
         """Call GitHub Models API via LangChain (deprecated, use workflow instead)"""
@@ -282,35 +530,22 @@ Fix the compilation errors and issues. Return the corrected test files.""")
             messages.append(SystemMessage(content=system_prompt))
         messages.append(HumanMessage(content=prompt))
         
-        response = await self.llm.ainvoke(messages)
+        async with self.llm_slots:
+            response = await self._invoke_with_retry(self.llm, messages)
         return response.content
     
-    async def generate_initial_tests(self, cpp_files: List[str], framework: str = "google_test") -> Dict[str, Any]:
+    async def generate_initial_tests(self, cpp_files: List[str], framework: str = "google_test", callbacks: Optional[List[Any]] = None, cache: bool = True, fast_mode: bool = False, run_id: Optional[str] = None) -> Dict[str, Any]:
         """Generate initial unit tests for C++ files using LangGraph workflow"""
         
-        # Read C++ source files
-        source_code = {}
-        for file_path in cpp_files:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                source_code[file_path] = f.read()
-        
-        # Create initial state
-        initial_state = TestGenerationState(
-            source_code=source_code,
-            framework=framework,
-            instructions=self.instructions["initial_generation"],
-            generated_tests={},
-            build_logs=[],
-            iteration_count=0,
-            messages=[]
-        )
+        # Read C++ source files, sending identical copies only once
+        source_code = self._dedupe_sources(await self._read_source_files(cpp_files))
         
         # Run the workflow
-        result = await self.workflow.ainvoke(initial_state)
+        result = await self._run_parallel_workflows(source_code, framework, self._run_config(callbacks, cache), fast_mode, run_id or uuid.uuid4().hex)
         
         return {"tests": result["generated_tests"]}
     
-    async def refine_tests(self, test_files: Dict[str, str], build_logs: List[str] = None) -> Dict[str, Any]:
+    async def refine_tests(self, test_files: Dict[str, str], build_logs: List[str] = None, callbacks: Optional[List[Any]] = None, cache: bool = True) -> Dict[str, Any]:
         """Refine existing tests using LangGraph workflow"""
         
         # Create state for refinement
@@ -318,118 +553,220 @@ Fix the compilation errors and issues. Return the corrected test files.""")
             source_code={},
             framework="google_test",
             instructions=self.instructions["refinement"],
+            instructions_yaml=self.instructions_yaml["refinement"],
             generated_tests=test_files,
             build_logs=build_logs or [],
             iteration_count=0,
+            fast_mode=False,
             messages=[]
         )
         
         # Run refinement node directly
-        result = await self._refine_tests_node(state)
+        result = await self._refine_tests_node(state, self._run_config(callbacks, cache))
         
         return {"tests": result["generated_tests"]}
     
-    async def fix_build_issues(self, source_files: Dict[str, str], test_files: Dict[str, str], build_logs: List[str]) -> Dict[str, Any]:
+    async def fix_build_issues(self, source_files: Dict[str, str], test_files: Dict[str, str], build_logs: List[str], callbacks: Optional[List[Any]] = None, cache: bool = True) -> Dict[str, Any]:
         """Fix compilation and build issues using LangGraph workflow"""
         
+        # Nothing to fix without build errors
+        if not build_logs:
+            return {"tests": test_files}
+        
         # Create state for build fixing
         state = TestGenerationState(
             source_code=source_files,
             framework="google_test",
             instructions=self.instructions["build_fix"],
+            instructions_yaml=self.instructions_yaml["build_fix"],
             generated_tests=test_files,
             build_logs=build_logs,
             iteration_count=0,
+            fast_mode=False,
             messages=[]
         )
         
         # Run build fix node directly
-        result = await self._fix_build_issues_node(state)
+        result = await self._fix_build_issues_node(state, self._run_config(callbacks, cache))
         
         return {"tests": result["generated_tests"]}
     
-    async def run_complete_workflow(self, cpp_files: List[str], framework: str = "google_test") -> Dict[str, Any]:
+    async def run_complete_workflow(self, cpp_files: List[str], framework: str = "google_test", callbacks: Optional[List[Any]] = None, cache: bool = True, fast_mode: bool = False, run_id: Optional[str] = None) -> Dict[str, Any]:
         """Run the complete test generation workflow"""
         
-        # Read C++ source files
-        source_code = {}
-        for file_path in cpp_files:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                source_code[file_path] = f.read()
-        
-        # Create initial state
-        initial_state = TestGenerationState(
-            source_code=source_code,
-            framework=framework,
-            instructions=self.instructions["initial_generation"],
-            generated_tests={},
-            build_logs=[],
-            iteration_count=0,
-            messages=[]
-        )
+        # Read C++ source files, sending identical copies only once
+        sources = await self._read_source_files(cpp_files)
+        source_code = self._dedupe_sources(sources)
         
         # Run the complete workflow
-        result = await self.workflow.ainvoke(initial_state)
+        result = await self._run_parallel_workflows(source_code, framework, self._run_config(callbacks, cache), fast_mode, run_id or uuid.uuid4().hex)
+        
+        return {
+            "tests": result["generated_tests"],
+            "sources": sources,
+            "messages": result["messages"],
+            "iteration_count": result["iteration_count"]
+        }
+    
+    async def run_batched_workflow(self, cpp_files: List[str], framework: str = "google_test", batch_size: int = 1, callbacks: Optional[List[Any]] = None, cache: bool = True, fast_mode: Optional[bool] = False, run_id: Optional[str] = None) -> Dict[str, Any]:
+        """Run the complete workflow with up to batch_size files per LLM request, one translation unit by default"""
+        
+        # Read C++ source files, sending identical copies only once
+        sources = await self._read_source_files(cpp_files)
+        source_code = self._dedupe_sources(sources)
+        
+        # Run one workflow per batch of translation units
+        result = await self._run_parallel_workflows(source_code, framework, self._run_config(callbacks, cache), fast_mode, run_id or uuid.uuid4().hex, batch_size)
         
         return {
             "tests": result["generated_tests"],
+            "sources": sources,
             "messages": result["messages"],
             "iteration_count": result["iteration_count"]
         }
     
+    async def _read_source_files(self, cpp_files: List[str]) -> Dict[str, str]:
+        """Read source files concurrently on worker threads"""
+        contents = await asyncio.gather(*(asyncio.to_thread(_read_text, path) for path in cpp_files))
+        return dict(zip(cpp_files, contents))
+    
+    def _dedupe_sources(self, source_code: Dict[str, str]) -> Dict[str, str]:
+        """Keep one entry per distinct file content, noting the duplicate paths"""
+        unique = {}
+        for file_path, content in source_code.items():
+            unique.setdefault(xxhash.xxh3_128_digest(content.encode()), []).append(file_path)
+        
+        deduped = {}
+        for paths in unique.values():
+            content = source_code[paths[0]]
+            if len(paths) > 1:
+                content = f"// Identical copies: {', '.join(paths[1:])}\n{content}"
+            deduped[paths[0]] = content
+        return deduped
+    
+    def _run_config(self, callbacks: Optional[List[Any]], cache: bool) -> RunnableConfig:
+        """Build the config threaded through the workflow nodes"""
+        return {"callbacks": callbacks, "configurable": {"cache": cache}}
+    
+    async def _run_parallel_workflows(self, source_code: Dict[str, str], framework: str, config: Optional[RunnableConfig] = None, fast_mode: Optional[bool] = False, run_id: str = "", batch_size: int = 1) -> Dict[str, Any]:
+        """Run the workflow concurrently per batch of translation units and merge the results"""
+        
+        workflow = await self._get_workflow()
+        
+        async def run_group(group: Dict[str, str]) -> Dict[str, Any]:
+            initial_state = TestGenerationState(
+                source_code=group,
+                framework=framework,
+                instructions=self.instructions["initial_generation"],
+                instructions_yaml=self.instructions_yaml["initial_generation"],
+                generated_tests={},
+                build_logs=[],
+                iteration_count=0,
+                # Small units rarely need a separate refinement round trip
+                fast_mode=fast_mode if fast_mode is not None else sum(map(len, group.values())) <= FAST_MODE_MAX_CHARS,
+                messages=[]
+            )
+            # One checkpoint thread per group; reusing a run_id resumes failed groups
+            thread_id = f"{run_id}:{Path(next(iter(group))).stem}"
+            thread_config = {**(config or {}), "configurable": {**(config or {}).get("configurable", {}), "thread_id": thread_id}}
+            snapshot = await workflow.aget_state(thread_config)
+            resume = bool(snapshot.next) and all(
+                snapshot.values.get(key) == initial_state[key] for key in ("source_code", "framework", "fast_mode")
+            )
+            if snapshot.values and not resume:
+                # Left over from a run with different inputs
+                await self.checkpointer.adelete_thread(thread_id)
+            result = await workflow.ainvoke(None if resume else initial_state, thread_config)
+            
+            # Finished runs have nothing to resume
+            await self.checkpointer.adelete_thread(thread_id)
+            return result
+        
+        batches = self._batch_groups(self._group_source_files(source_code), batch_size)
+        results = await asyncio.gather(*(run_group(batch) for batch in batches))
+        
+        merged = {"generated_tests": {}, "messages": [], "iteration_count": 0}
+        for result in results:
+            merged["generated_tests"].update(result["generated_tests"])
+            merged["messages"].extend(result["messages"])
+            merged["iteration_count"] = max(merged["iteration_count"], result["iteration_count"])
+        return merged
+    
+    def _group_source_files(self, source_code: Dict[str, str]) -> List[Dict[str, str]]:
+        """Group files by stem so each header is sent with its implementation"""
+        groups = {}
+        for file_path, content in source_code.items():
+            groups.setdefault(Path(file_path).stem, {})[file_path] = content
+        return list(groups.values())
+    
+    def _batch_groups(self, groups: List[Dict[str, str]], batch_size: int) -> List[Dict[str, str]]:
+        """Pack whole groups into batches of at most batch_size files"""
+        batches = []
+        for group in groups:
+            if batches and len(batches[-1]) + len(group) <= batch_size:
+                batches[-1].update(group)
+            else:
+                batches.append(dict(group))
+        return batches
+    
+    def _sources_for_test(self, test_content: str, source_code: Dict[str, str]) -> Dict[str, str]:
+        """Select the sources whose header or implementation a test includes"""
+        included = {Path(header).stem for header in _INCLUDE_RE.findall(test_content)}
+        sources = {path: content for path, content in source_code.items() if Path(path).stem in included}
+        return sources or source_code
+    
     def _format_source_code(self, source_code: Dict[str, str]) -> str:
         """Format source code for prompt"""
-        formatted = []
-        for file_path, content in source_code.items():
-            formatted.append(f"=== {file_path} ===")
-            formatted.append(content)
-            formatted.append("")
-        return "\n".join(formatted)
+        return "\n".join(f"=== {file_path} ===\n{content}\n" for file_path, content in source_code.items())
     
     def _format_test_files(self, test_files: Dict[str, str]) -> str:
         """Format test files for prompt"""
-        formatted = []
-        for filename, content in test_files.items():
-            formatted.append(f"=== {filename} ===")
-            formatted.append(content)
-            formatted.append("")
-        return "\n".join(formatted)
+        return "\n".join(f"=== {filename} ===\n{content}\n" for filename, content in test_files.items())
     
     def _parse_test_response(self, response: str) -> Dict[str, Any]:
         """Parse LLM response to extract test files"""
-        test_files = {}
-        
-        # Split response by test file markers
-        parts = response.split("===TEST_FILE_START===")
-        
-        for part in parts[1:]:  # Skip first empty part
-            if "===TEST_FILE_END===" in part:
-                content = part.split("===TEST_FILE_END===")[0].strip()
-                lines = content.split('\n')
-                
-                filename = None
-                test_content = []
-                
-                for line in lines:
-                    if line.startswith("filename:"):
-                        filename = line.split("filename:")[1].strip()
-                    elif line.startswith("content:"):
-                        test_content.append(line.split("content:")[1].strip())
-                    elif filename and not line.startswith("filename:"):
-                        test_content.append(line)
-                
-                if filename and test_content:
-                    test_files[filename] = "\n".join(test_content)
-        
+        test_files = {
+            match.group("name").strip(): match.group("body").strip()
+            for match in _BLOCK_RE.finditer(response)
+        }
         return {"tests": test_files}
     
+    async def delete_run(self, run_id: str, cpp_files: List[str]):
+        """Drop the checkpoints a run left behind for the given files"""
+        if self.checkpointer is None:
+            return
+        
+        # Thread ids are derived from the stem of the first file of each group
+        for stem in dict.fromkeys(Path(file_path).stem for file_path in cpp_files):
+            await self.checkpointer.adelete_thread(f"{run_id}:{stem}")
+    
+    async def aclose(self):
+        """Close the checkpoint database and the shared HTTP client"""
+        async with self._checkpointer_lock:
+            if self.checkpointer is not None:
+                await self.checkpointer.conn.close()
+                self.checkpointer = None
+                self.__dict__.pop("workflow", None)
+        
+        if "_http_client" in self.__dict__:
+            await self.__dict__.pop("_http_client").aclose()
+            self.__dict__.pop("llm", None)
+            self.__dict__.pop("_probe_llm", None)
+            self._chains.clear()
+    
     async def check_llm_connection(self) -> bool:
         """Check if GitHub Models API is accessible"""
         try:
-            # Test with a simple message
-            test_message = HumanMessage(content="Hello, test connection")
-            response = await self.llm.ainvoke([test_message])
+            # Test with a minimal message and fail fast on a dead endpoint
+            test_message = HumanMessage(content="ping")
+            response = await asyncio.wait_for(
+                self._invoke_with_retry(self._probe_llm, [test_message]),
+                timeout=PROBE_TIMEOUT_SECONDS
+            )
             return response.content is not None
+        except asyncio.TimeoutError:
+            print(f"LLM connection timed out after {PROBE_TIMEOUT_SECONDS}s")
+            return False
         except Exception as e:
             print(f"LLM connection failed: {e}")
             return False
@@ -0,0 +1,68 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional
+
+class ProjectStore:
+    """In-process LRU registry of uploaded projects guarded by an asyncio lock"""
+
+    def __init__(self, max_projects: int = 256, ttl: float = 3600,
+                 on_evict: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.max_projects = max_projects
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._projects: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def get(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """Return the project record, or None if it is not registered"""
+        async with self._lock:
+            self._evict_expired()
+            project = self._projects.get(project_id)
+            if project is not None:
+                self._touch(project_id)
+            return project
+
+    async def put(self, project_id: str, project: Dict[str, Any]):
+        """Register or replace a project record"""
+        async with self._lock:
+            self._projects[project_id] = project
+            self._touch(project_id)
+            self._evict_expired()
+            while len(self._projects) > self.max_projects:
+                self._evict(next(iter(self._projects)))
+
+    async def remove(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """Unregister a project and return its record"""
+        async with self._lock:
+            self._last_access.pop(project_id, None)
+            return self._projects.pop(project_id, None)
+
+    async def values(self) -> List[Dict[str, Any]]:
+        """Return the records of all registered projects"""
+        async with self._lock:
+            return list(self._projects.values())
+
+    def _touch(self, project_id: str):
+        """Mark a project as most recently used"""
+        self._projects.move_to_end(project_id)
+        self._last_access[project_id] = time.monotonic()
+
+    def _evict_expired(self):
+        """Drop projects idle for longer than the TTL"""
+        deadline = time.monotonic() - self.ttl
+        # Entries are kept in access order, so expired ones are at the front
+        while self._projects:
+            oldest_id = next(iter(self._projects))
+            if self._last_access[oldest_id] > deadline:
+                break
+            self._evict(oldest_id)
+
+    def _evict(self, project_id: str):
+        """Drop a project and hand its record to the eviction callback"""
+        project = self._projects.pop(project_id)
+        self._last_access.pop(project_id, None)
+        print(f"Evicting inactive project: {project_id}")
+        if self.on_evict is not None:
+            self.on_evict(project)
@@ -1,125 +1,464 @@
 import os
 import asyncio
 import subprocess
+import functools
 import tempfile
 import shutil
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 import re
 import yaml
+import xxhash
+import aiofiles
+import json
+import pickle
+import mmap
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# tree-sitter gives a real C++ parse; without it analysis falls back to regexes
+try:
+    import tree_sitter_cpp
+    from tree_sitter import Language, Parser
+except ImportError:
+    tree_sitter_cpp = None
 
 from models.schemas import ProjectInfo, GeneratedTest, CoverageReport, BuildLog
 from services.llm_service import LLMService
 
+# Persistent cache shared across uploads and server restarts
+CACHE_DIR = Path(os.getenv("TESTGEN_CACHE_DIR", Path.home() / ".cache" / "testgen"))
+ANALYSIS_CACHE_DIR = CACHE_DIR / "analysis"
+AST_CACHE_DIR = CACHE_DIR / "ast"
+AST_CACHE_MAX_ENTRIES = int(os.getenv("TESTGEN_AST_CACHE_MAX_ENTRIES", "10000"))
+COVERAGE_CACHE_DIR = CACHE_DIR / "coverage"
+
+# Caps open files when large test suites are written concurrently
+MAX_CONCURRENT_WRITES = 64
+
+# GoogleTest checkout shared by every generated project
+GTEST_REPO = "https://github.com/google/googletest.git"
+GTEST_VERSION = "v1.14.0"
+GTEST_DIR = Path(os.getenv("TESTGEN_GTEST_DIR", CACHE_DIR / "vendor" / "googletest"))
+
+# Used when no local checkout is available
+GTEST_FETCHCONTENT = """include(FetchContent)
+FetchContent_Declare(
+  googletest
+  URL https://github.com/google/googletest/archive/03597a01ee50ed33e9fd7188feb57d74c5b18a2.zip
+)
+FetchContent_MakeAvailable(googletest)"""
+
+# C++ file kinds by extension
+SOURCE_KIND = "source"
+HEADER_KIND = "header"
+EXT_MAP = {
+    '.cpp': SOURCE_KIND, '.cc': SOURCE_KIND, '.cxx': SOURCE_KIND,
+    '.h': HEADER_KIND, '.hpp': HEADER_KIND,
+}
+
+# Class, include and function patterns fused into one alternation so each
+# source is scanned once; matched against raw file bytes
+COMBINED_RE = re.compile(
+    rb'\bclass\s+(?P<cls>\w+)'
+    rb'|#include\s*[<"](?P<inc>[^>"]+)[>"]'
+    rb'|\b(?P<ret>\w+)\s+(?P<fn>\w+)\s*\([^)]*\)\s*{'
+)
+TEST_RE = re.compile(r'TEST\([^,]+,\s*(\w+)\)')
+# Per-file summary in gcov output: "File 'x.cpp'" followed by "Lines executed:85.71% of 7"
+COV_RE = re.compile(r"File '([^']+)'\s+Lines executed:([\d.]+)%", re.MULTILINE)
+
+# Projects below this total size are analyzed in one thread; starting and
+# feeding worker processes costs more than the scan itself
+SMALL_PROJECT_BYTES = 256 * 1024
+
+# Files are sent to the workers in about this many chunks per worker
+ANALYSIS_CHUNKS_PER_WORKER = 4
+
+_analysis_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_analysis_pool() -> ProcessPoolExecutor:
+    """Return the process pool used for analyzing source files"""
+    global _analysis_pool
+    if _analysis_pool is None:
+        # Forking the threaded server could copy held locks into the workers, so
+        # start them from a forkserver that has this module already imported
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload([__name__])
+        else:
+            context = multiprocessing.get_context("spawn")
+        _analysis_pool = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=context)
+    return _analysis_pool
+
+def shutdown_analysis_pool():
+    """Stop the analysis worker processes, if they were started"""
+    global _analysis_pool
+    if _analysis_pool is not None:
+        _analysis_pool.shutdown(cancel_futures=True)
+        _analysis_pool = None
+
+# Name of the analyzer in use, part of the analysis cache keys
+ANALYZER = "tree-sitter" if tree_sitter_cpp is not None else "regex"
+
+# Bump when analysis output changes so that cached results are not reused
+ANALYSIS_VERSION = 2
+ANALYSIS_TAG = f"{ANALYZER}-v{ANALYSIS_VERSION}"
+
+# Syntax nodes whose subtrees cannot hold top-level declarations or includes
+_TS_SKIP = {"compound_statement", "parameter_list", "argument_list"}
+
+_ts_local = threading.local()
+
+def _ts_parser():
+    """Return this thread's tree-sitter C++ parser; parsers are not thread-safe"""
+    parser = getattr(_ts_local, "parser", None)
+    if parser is None:
+        parser = _ts_local.parser = Parser(Language(tree_sitter_cpp.language()))
+    return parser
+
+def _ts_function_name(node, data) -> Optional[str]:
+    """Return 'return_type name' for a function_definition node"""
+    declarator = node.child_by_field_name("declarator")
+    while declarator is not None and declarator.type != "function_declarator":
+        declarator = declarator.child_by_field_name("declarator")
+    name = declarator.child_by_field_name("declarator") if declarator is not None else None
+    if name is None:
+        return None
+    
+    return_type = node.child_by_field_name("type")
+    signature = _text(data[name.start_byte:name.end_byte])
+    if return_type is not None:
+        signature = f"{_text(data[return_type.start_byte:return_type.end_byte])} {signature}"
+    return signature
+
+def _ts_analyze(data) -> tuple:
+    """Extract (functions, classes, includes) from a tree-sitter parse"""
+    tree = _ts_parser().parse(data)
+    functions, classes, includes = [], [], []
+    
+    # Walk in source order without descending into function bodies
+    stack = [tree.root_node]
+    while stack:
+        node = stack.pop()
+        if node.type == "function_definition":
+            signature = _ts_function_name(node, data)
+            if signature:
+                functions.append(signature)
+            continue
+        if node.type == "class_specifier":
+            name = node.child_by_field_name("name")
+            if name is not None:
+                classes.append(_text(data[name.start_byte:name.end_byte]))
+        elif node.type == "preproc_include":
+            path = node.child_by_field_name("path")
+            if path is not None:
+                includes.append(_text(data[path.start_byte:path.end_byte]).strip('<>"'))
+            continue
+        if node.type not in _TS_SKIP:
+            stack.extend(reversed(node.children))
+    
+    return functions, classes, includes
+
+def _regex_analyze(data) -> tuple:
+    """Extract (functions, classes, includes) with the fused regex"""
+    # Scan the bytes once and decode only the captured names
+    functions, classes, includes = [], [], []
+    for match in COMBINED_RE.finditer(data):
+        kind = match.lastgroup
+        if kind == 'fn':
+            functions.append(f"{_text(match.group('ret'))} {_text(match.group('fn'))}")
+        elif kind == 'cls':
+            classes.append(_text(match.group('cls')))
+        else:
+            includes.append(_text(match.group('inc')))
+    return functions, classes, includes
+
+def _text(match: bytes) -> str:
+    """Decode a regex capture from a source file"""
+    return match.decode('utf-8', errors='ignore')
+
+def _analyze_one(path: str) -> tuple:
+    """Extract (functions, classes, includes) from one source file"""
+    try:
+        with open(path, 'rb') as f:
+            # mmap cannot map an empty file, and there is nothing to find in one
+            if os.fstat(f.fileno()).st_size == 0:
+                return [], [], []
+            # Map the file so large sources are scanned from the page cache
+            # instead of being copied onto the heap
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return _analyze_data(path, data)
+    except OSError as e:
+        print(f"Error reading file {path}: {e}")
+        return [], [], []
+
+def _analyze_data(path: str, data) -> tuple:
+    """Extract (functions, classes, includes) from a file's bytes"""
+    # Reuse the result for identical content seen in any earlier project
+    cache_path = AST_CACHE_DIR / f"{ANALYSIS_TAG}-{xxhash.xxh3_128_hexdigest(data)}.pkl"
+    try:
+        with open(cache_path, 'rb') as f:
+            result = pickle.load(f)
+        os.utime(cache_path)
+        return result
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+    
+    result = _ts_analyze(data) if tree_sitter_cpp is not None else _regex_analyze(data)
+    
+    try:
+        AST_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.stem}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Could not cache analysis of {path}: {e}")
+    return result
+
+def _prune_ast_cache():
+    """Drop the least recently used per-file analyses beyond the size limit"""
+    try:
+        with os.scandir(AST_CACHE_DIR) as entries:
+            cached = [entry for entry in entries if entry.name.endswith('.pkl')]
+    except OSError:
+        return
+    if len(cached) <= AST_CACHE_MAX_ENTRIES:
+        return
+    
+    cached.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in cached[:len(cached) - AST_CACHE_MAX_ENTRIES]:
+        try:
+            os.unlink(entry.path)
+        except OSError:
+            pass
+
+def _analyze_many(paths: List[str]) -> List[tuple]:
+    """Analyze several files, in order"""
+    return [_analyze_one(path) for path in paths]
+
+def _file_sizes(paths: List[str]) -> List[int]:
+    """Sizes of the given files, 0 for any that cannot be read"""
+    sizes = []
+    for path in paths:
+        try:
+            sizes.append(os.path.getsize(path))
+        except OSError:
+            sizes.append(0)
+    return sizes
+
+@functools.lru_cache(maxsize=None)
+def _have(tool: str) -> bool:
+    """Whether a build tool runs; probed once per process"""
+    try:
+        return subprocess.run([tool, "--version"], capture_output=True, timeout=5).returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+async def _run(cmd: List[str], cwd: Optional[Path] = None, timeout: float = 60) -> tuple:
+    """Run a command without blocking the event loop and return (returncode, stdout, stderr)"""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        proc.kill()
+        await proc.wait()
+        raise
+    return proc.returncode, stdout.decode(errors='replace'), stderr.decode(errors='replace')
+
+async def _write_text(path: Path, content: str):
+    """Write a UTF-8 text file without blocking the event loop"""
+    async with aiofiles.open(path, 'w', encoding='utf-8') as f:
+        await f.write(content)
+
+async def _read_text(path: str) -> str:
+    """Read a UTF-8 text file without blocking the event loop"""
+    async with aiofiles.open(path, 'r', encoding='utf-8') as f:
+        return await f.read()
+
 class TestGenerator:
     def __init__(self, llm_service: LLMService):
         self.llm_service = llm_service
         self.cmake_template = self._load_cmake_template()
+        self._gtest_task = None
+        self._write_slots = asyncio.Semaphore(MAX_CONCURRENT_WRITES)
     
     async def analyze_project(self, project_path: Path) -> ProjectInfo:
         """Analyze C++ project structure and complexity"""
-        cpp_files = []
-        header_files = []
-        all_functions = []
-        all_classes = []
-        dependencies = set()
-        
         # Debug: Check if project path exists
         if not project_path.exists():
             raise FileNotFoundError(f"Project path does not exist: {project_path}")
         
-        # Scan for C++ files
-        for ext in ['*.cpp', '*.cc', '*.cxx']:
-            found_files = list(project_path.glob(ext))
-            cpp_files.extend(found_files)
+        cpp_files, header_files = await asyncio.to_thread(self._scan_project_files, project_path)
         
-        for ext in ['*.h', '*.hpp']:
-            found_files = list(project_path.glob(ext))
-            header_files.extend(found_files)
+        # Reuse a previous analysis of identical sources
+        try:
+            cache_key = await asyncio.to_thread(self._fingerprint_files, project_path, cpp_files + header_files)
+        except OSError as e:
+            print(f"Could not fingerprint project files: {e}")
+            cache_key = None
+        
+        if cache_key:
+            cached_info = await asyncio.to_thread(self._load_cached_analysis, cache_key, project_path)
+            if cached_info is not None:
+                return cached_info
+        
+        project_info = await self._analyze_files(project_path, cpp_files, header_files)
+        
+        if cache_key:
+            await asyncio.to_thread(self._store_cached_analysis, cache_key, project_path, project_info)
+        return project_info
+    
+    def _scan_project_files(self, project_path: Path) -> tuple:
+        """Find C++ source and header files in the project with a single tree walk"""
+        found = {SOURCE_KIND: [], HEADER_KIND: []}
+        stack = [str(project_path)]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    kind = EXT_MAP.get(os.path.splitext(entry.name)[1].lower())
+                    if kind and entry.is_file(follow_symlinks=False):
+                        found[kind].append(Path(entry.path))
+        
+        return found[SOURCE_KIND], found[HEADER_KIND]
+    
+    def _fingerprint_files(self, project_path: Path, files: List[Path]) -> str:
+        """Hash the analyzer, relative paths and contents of the given files"""
+        digest = xxhash.xxh3_128()
+        digest.update(ANALYSIS_TAG.encode())
+        digest.update(b"\0")
+        for file_path in sorted(files):
+            digest.update(str(file_path.relative_to(project_path)).encode())
+            digest.update(b"\0")
+            digest.update(file_path.read_bytes())
+            digest.update(b"\0")
+        return digest.hexdigest()
+    
+    def _load_cached_analysis(self, cache_key: str, project_path: Path) -> Optional[ProjectInfo]:
+        """Load a cached analysis and re-anchor its files in project_path"""
+        cache_path = ANALYSIS_CACHE_DIR / f"{cache_key}.json"
+        try:
+            data = json.loads(cache_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        
+        data["name"] = project_path.name
+        data["files"] = [str(project_path / f) for f in data["files"]]
+        return ProjectInfo(**data)
+    
+    def _store_cached_analysis(self, cache_key: str, project_path: Path, project_info: ProjectInfo):
+        """Persist an analysis with files stored relative to project_path"""
+        data = project_info.model_dump()
+        data["files"] = [str(Path(f).relative_to(project_path)) for f in data["files"]]
+        
+        try:
+            ANALYSIS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_path = ANALYSIS_CACHE_DIR / f"{cache_key}.{os.getpid()}.tmp"
+            tmp_path.write_text(json.dumps(data), encoding='utf-8')
+            os.replace(tmp_path, ANALYSIS_CACHE_DIR / f"{cache_key}.json")
+        except OSError as e:
+            print(f"Could not cache project analysis: {e}")
+    
+    async def _analyze_files(self, project_path: Path, cpp_files: List[Path], header_files: List[Path]) -> ProjectInfo:
+        """Extract functions, classes and includes from the given files"""
+        # Insertion-ordered dicts drop duplicates as results are merged
+        all_functions = {}
+        all_classes = {}
+        dependencies = {}
         
         # Debug: Log found files
         print(f"Found C++ files: {[str(f) for f in cpp_files]}")
         print(f"Found header files: {[str(f) for f in header_files]}")
         
-        # Analyze code complexity
-        for file_path in cpp_files + header_files:
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                    
-                    # Extract function names (improved regex)
-                    function_matches = re.findall(r'\b(\w+)\s+(\w+)\s*\([^)]*\)\s*{', content)
-                    for return_type, func_name in function_matches:
-                        all_functions.append(f"{return_type} {func_name}")
-                    
-                    # Extract class names
-                    class_matches = re.findall(r'\bclass\s+(\w+)', content)
-                    all_classes.extend(class_matches)
-                    
-                    # Extract includes for dependencies
-                    includes = re.findall(r'#include\s*[<"]([^>"]+)[>"]', content)
-                    dependencies.update(includes)
-            except Exception as e:
-                print(f"Error reading file {file_path}: {e}")
-                continue
-        
-        # Combine all files for the files field
-        all_files = [str(f) for f in cpp_files + header_files]
+        files = [str(f) for f in cpp_files + header_files]
+        sizes = await asyncio.to_thread(_file_sizes, files)
+        
+        if sum(sizes) < SMALL_PROJECT_BYTES:
+            file_results = await asyncio.to_thread(_analyze_many, files)
+        else:
+            # Workers are sent paths, several per task to amortize the round trip
+            workers = os.cpu_count() or 1
+            chunk_size = max(1, -(-len(files) // (workers * ANALYSIS_CHUNKS_PER_WORKER)))
+            chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+            
+            loop = asyncio.get_running_loop()
+            pool = _get_analysis_pool()
+            chunk_results = await asyncio.gather(*(loop.run_in_executor(pool, _analyze_many, chunk) for chunk in chunks))
+            file_results = [result for chunk in chunk_results for result in chunk]
+        
+        # Merge per-file results in file order
+        for functions, classes, includes in file_results:
+            all_functions.update(dict.fromkeys(functions))
+            all_classes.update(dict.fromkeys(classes))
+            dependencies.update(dict.fromkeys(includes))
+        
+        await asyncio.to_thread(_prune_ast_cache)
         
         return ProjectInfo(
             name=project_path.name,
-            files=all_files,
-            classes=all_classes,
-            functions=all_functions,
+            files=files,
+            classes=list(all_classes),
+            functions=list(all_functions),
             dependencies=list(dependencies)
         )
     
     async def generate_tests(self, project_path: Path, cpp_files: List[str], 
-                           llm_model: str, test_framework: str) -> Dict[str, Any]:
+                           llm_model: str, test_framework: str, run_id: Optional[str] = None,
+                           fast_mode: Optional[bool] = None) -> Dict[str, Any]:
         """Complete test generation workflow using LangGraph"""
         
-        # Step 1: Use LangGraph workflow for comprehensive test generation
-        print("🔄 Running LangGraph workflow for test generation...")
-        workflow_result = await self.llm_service.run_complete_workflow(cpp_files, test_framework)
-        
-        # Step 2: Save generated tests
+        # Step 1: Create build system and configure it while the LLM works
         tests_dir = project_path / "tests"
         tests_dir.mkdir(exist_ok=True)
+        configure_task = asyncio.create_task(self._prepare_build(project_path, cpp_files, test_framework))
         
-        test_files = {}
-        for filename, content in workflow_result["tests"].items():
-            test_path = tests_dir / filename
-            with open(test_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            test_files[filename] = content
-        
-        # Step 3: Create build system
-        await self._create_build_system(project_path, cpp_files, test_framework)
+        try:
+            # Step 2: Use LangGraph workflow for comprehensive test generation
+            print("🔄 Running LangGraph workflow for test generation...")
+            # One workflow per translation unit, run concurrently; a joined prompt
+            # would serialize decoding and share a single output budget
+            workflow_result = await self.llm_service.run_batched_workflow(
+                cpp_files, test_framework, batch_size=1, fast_mode=fast_mode, run_id=run_id
+            )
+            
+            # Step 3: Save generated tests
+            test_files = dict(workflow_result["tests"])
+            await self._write_files(tests_dir, test_files)
+            
+            # Step 4: Attempt to build; the test globs are re-checked at build time
+            print("🔄 Building tests...")
+            build_result = await configure_task
+        except BaseException:
+            configure_task.cancel()
+            raise
+        if build_result["success"]:
+            build_result = await self._compile(project_path)
         
-        # Step 4: Attempt to build
-        print("🔄 Building tests...")
-        build_result = await self._build_tests(project_path)
+        # Sources were already read for the workflow
+        source_files = workflow_result["sources"]
         
         # Step 5: If build fails, use LangGraph to fix issues
         if not build_result["success"]:
             print("⚠️  Build failed, using LangGraph to fix issues...")
             
-            source_files = {}
-            for cpp_file in cpp_files:
-                with open(cpp_file, 'r', encoding='utf-8') as f:
-                    source_files[cpp_file] = f.read()
-            
             # Use LangGraph workflow to fix build issues
             fixed_tests = await self.llm_service.fix_build_issues(
                 source_files, test_files, build_result["logs"]
             )
             
             # Save fixed tests
-            for filename, content in fixed_tests["tests"].items():
-                test_path = tests_dir / filename
-                with open(test_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                test_files[filename] = content
+            await self._write_files(tests_dir, fixed_tests["tests"])
+            test_files.update(fixed_tests["tests"])
             
             # Try building again
             build_result = await self._build_tests(project_path)
@@ -128,7 +467,7 @@ class TestGenerator:
         coverage_report = None
         if build_result["success"]:
             print("🔄 Generating coverage report...")
-            coverage_report = await self._generate_coverage_report(project_path)
+            coverage_report = await self._generate_coverage_report(project_path, test_files, source_files)
         
         # Step 7: Create generated test objects
         generated_tests = []
@@ -152,18 +491,38 @@ class TestGenerator:
             "iteration_count": workflow_result.get("iteration_count", 0)
         }
     
+    async def _write_files(self, directory: Path, files: Dict[str, str]):
+        """Write files concurrently with a bounded number open at once"""
+        async def write(filename: str, content: str):
+            async with self._write_slots:
+                await _write_text(directory / filename, content)
+        
+        await asyncio.gather(*(write(filename, content) for filename, content in files.items()))
+    
+    async def _prepare_build(self, project_path: Path, cpp_files: List[str], framework: str) -> Dict[str, Any]:
+        """Create the build system and run its configure step"""
+        await self._create_build_system(project_path, cpp_files, framework)
+        return await self._configure(project_path)
+    
     async def _create_build_system(self, project_path: Path, cpp_files: List[str], framework: str):
         """Create CMakeLists.txt for building tests"""
         
-        cmake_content = self.cmake_template.format(
-            project_name=project_path.name,
-            cpp_files=" ".join([Path(f).name for f in cpp_files]),
-            framework=framework
+        gtest_dir = await self._gtest_checkout()
+        cmake_content = self._render_cmake(
+            project_path.name,
+            tuple(sorted(Path(f).name for f in cpp_files)),
+            framework,
+            gtest_dir
         )
         
+        # Leave an identical CMakeLists.txt untouched so CMake does not reconfigure
         cmake_path = project_path / "CMakeLists.txt"
-        with open(cmake_path, 'w', encoding='utf-8') as f:
-            f.write(cmake_content)
+        try:
+            unchanged = await _read_text(cmake_path) == cmake_content
+        except (OSError, UnicodeDecodeError):
+            unchanged = False
+        if not unchanged:
+            await _write_text(cmake_path, cmake_content)
         
         # Create a basic main.cpp if it doesn't exist
         main_cpp = project_path / "main.cpp"
@@ -179,71 +538,100 @@ int main() {
             with open(main_cpp, 'w', encoding='utf-8') as f:
                 f.write(main_content)
     
+    @functools.lru_cache(maxsize=64)
+    def _render_cmake(self, project_name: str, cpp_files: tuple, framework: str, gtest_dir: Optional[Path]) -> str:
+        """Render the CMake template for a project"""
+        if gtest_dir is not None:
+            gtest = f'add_subdirectory("{gtest_dir.as_posix()}" "${{CMAKE_BINARY_DIR}}/googletest" EXCLUDE_FROM_ALL)'
+        else:
+            gtest = GTEST_FETCHCONTENT
+        
+        return self.cmake_template.format(
+            project_name=project_name,
+            cpp_files=" ".join(cpp_files),
+            framework=framework,
+            gtest=gtest
+        )
+    
+    async def _gtest_checkout(self) -> Optional[Path]:
+        """Return the shared GoogleTest checkout, cloning it on first use"""
+        if self._gtest_task is None:
+            self._gtest_task = asyncio.create_task(self._vendor_gtest())
+        # Shielded so that a cancelled generation does not abort the clone for everyone
+        return await asyncio.shield(self._gtest_task)
+    
+    async def _vendor_gtest(self) -> Optional[Path]:
+        """Clone GoogleTest into the shared cache unless it is already there"""
+        if (GTEST_DIR / "CMakeLists.txt").exists():
+            return GTEST_DIR
+        if not await asyncio.to_thread(_have, "git"):
+            print("git not found, builds will download GoogleTest")
+            return None
+        
+        # Clone next to the target and move it into place once complete
+        tmp_dir = GTEST_DIR.with_name(f"{GTEST_DIR.name}.{os.getpid()}.tmp")
+        await asyncio.to_thread(shutil.rmtree, tmp_dir, True)
+        try:
+            GTEST_DIR.parent.mkdir(parents=True, exist_ok=True)
+            returncode, _, stderr = await _run(
+                ["git", "clone", "--depth=1", "--branch", GTEST_VERSION, GTEST_REPO, str(tmp_dir)],
+                timeout=300
+            )
+            if returncode != 0:
+                print(f"Could not clone GoogleTest, builds will download it: {stderr.strip()}")
+                return None
+            os.replace(tmp_dir, GTEST_DIR)
+        except (OSError, asyncio.TimeoutError) as e:
+            print(f"Could not clone GoogleTest, builds will download it: {e!r}")
+            return None
+        finally:
+            await asyncio.to_thread(shutil.rmtree, tmp_dir, True)
+        
+        return GTEST_DIR
+    
     async def _build_tests(self, project_path: Path) -> Dict[str, Any]:
         """Build the test project"""
+        configure_result = await self._configure(project_path)
+        if not configure_result["success"]:
+            return configure_result
+        return await self._compile(project_path)
+    
+    async def _configure(self, project_path: Path) -> Dict[str, Any]:
+        """Run the CMake configure step for the test project"""
         # Check if CMake is available
-        try:
-            cmake_check = subprocess.run(
-                ["cmake", "--version"], 
-                capture_output=True, 
-                text=True,
-                timeout=10
-            )
-            if cmake_check.returncode != 0:
-                return {
-                    "success": False,
-                    "logs": ["CMake not found. Please install CMake and add it to PATH."]
-                }
-        except FileNotFoundError:
+        if not await asyncio.to_thread(_have, "cmake"):
             return {
                 "success": False,
                 "logs": ["CMake not found. Please install CMake and add it to PATH."]
             }
-        except Exception as e:
-            return {
-                "success": False,
-                "logs": [f"Error checking CMake: {str(e)}"]
-            }
         
         build_dir = project_path / "build"
         build_dir.mkdir(exist_ok=True)
         
+        configure_cmd = ["cmake", "..", "-DCMAKE_BUILD_TYPE=Debug"]
+        if await asyncio.to_thread(_have, "ninja"):
+            configure_cmd.append("-GNinja")
+        if await asyncio.to_thread(_have, "ccache"):
+            # Rebuilds after a fix reuse the unchanged objects
+            configure_cmd += ["-DCMAKE_C_COMPILER_LAUNCHER=ccache", "-DCMAKE_CXX_COMPILER_LAUNCHER=ccache"]
+        
+        return await self._run_build_step(configure_cmd, build_dir, 60)
+    
+    async def _compile(self, project_path: Path) -> Dict[str, Any]:
+        """Compile a configured test project"""
+        build_cmd = ["cmake", "--build", ".", "--config", "Debug", "--parallel", str(os.cpu_count() or 1)]
+        return await self._run_build_step(build_cmd, project_path / "build", 120)
+    
+    async def _run_build_step(self, cmd: List[str], build_dir: Path, timeout: float) -> Dict[str, Any]:
+        """Run one CMake step and report success with its logs"""
         try:
-            # Configure
-            configure_cmd = ["cmake", "..", "-DCMAKE_BUILD_TYPE=Debug"]
-            configure_result = subprocess.run(
-                configure_cmd, 
-                cwd=build_dir, 
-                capture_output=True, 
-                text=True,
-                timeout=60
-            )
-            
-            if configure_result.returncode != 0:
-                return {
-                    "success": False,
-                    "logs": [configure_result.stderr, configure_result.stdout]
-                }
-            
-            # Build
-            build_cmd = ["cmake", "--build", ".", "--config", "Debug"]
-            build_result = subprocess.run(
-                build_cmd, 
-                cwd=build_dir, 
-                capture_output=True, 
-                text=True,
-                timeout=120
-            )
-            
-            success = build_result.returncode == 0
-            logs = [build_result.stdout, build_result.stderr]
-            
+            returncode, stdout, stderr = await _run(cmd, cwd=build_dir, timeout=timeout)
             return {
-                "success": success,
-                "logs": logs
+                "success": returncode == 0,
+                "logs": [stdout, stderr]
             }
             
-        except subprocess.TimeoutExpired:
+        except asyncio.TimeoutError:
             return {
                 "success": False,
                 "logs": ["Build timeout"]
@@ -259,8 +647,42 @@ int main() {
                 "logs": [f"Build error: {str(e)}"]
             }
     
-    async def _generate_coverage_report(self, project_path: Path) -> Optional[CoverageReport]:
+    def _coverage_key(self, test_files: Dict[str, str], source_files: Dict[str, str]) -> str:
+        """Hash the tests and sources a coverage report was produced from"""
+        hasher = xxhash.xxh3_128()
+        for files in (test_files, source_files):
+            for name, content in sorted((Path(name).name, content) for name, content in files.items()):
+                hasher.update(f"{name}\0{content}\0".encode('utf-8', errors='surrogatepass'))
+            hasher.update(b"\1")
+        return hasher.hexdigest()
+    
+    async def _generate_coverage_report(self, project_path: Path, test_files: Optional[Dict[str, str]] = None,
+                                        source_files: Optional[Dict[str, str]] = None) -> Optional[CoverageReport]:
         """Generate code coverage report using gcov"""
+        
+        # Identical tests and sources produce the same report
+        cache_path = None
+        if test_files is not None and source_files is not None:
+            cache_path = COVERAGE_CACHE_DIR / f"{self._coverage_key(test_files, source_files)}.json"
+            try:
+                return CoverageReport.model_validate_json(await _read_text(cache_path))
+            except (OSError, ValueError):
+                pass
+        
+        report = await self._run_coverage(project_path)
+        
+        if report is not None and cache_path is not None:
+            try:
+                COVERAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                tmp_path = cache_path.with_name(f"{cache_path.stem}.{os.getpid()}.tmp")
+                await _write_text(tmp_path, report.model_dump_json())
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                print(f"Could not cache coverage report: {e}")
+        return report
+    
+    async def _run_coverage(self, project_path: Path) -> Optional[CoverageReport]:
+        """Run the tests and collect coverage with gcov"""
         try:
             build_dir = project_path / "build"
             
@@ -268,38 +690,26 @@ int main() {
             test_executable = build_dir / "test_runner"
             if test_executable.exists():
                 try:
-                    subprocess.run([str(test_executable)], cwd=build_dir, timeout=30)
-                except (FileNotFoundError, subprocess.TimeoutExpired) as e:
-                    print(f"Warning: Could not run test executable: {e}")
+                    await _run([str(test_executable)], cwd=build_dir, timeout=30)
+                except (FileNotFoundError, asyncio.TimeoutError) as e:
+                    print(f"Warning: Could not run test executable: {e!r}")
             
             # Check if gcov is available
-            try:
-                gcov_check = subprocess.run(
-                    ["gcov", "--version"], 
-                    capture_output=True, 
-                    text=True,
-                    timeout=10
-                )
-                if gcov_check.returncode != 0:
-                    print("Warning: gcov not available for coverage report")
-                    return None
-            except FileNotFoundError:
+            if not await asyncio.to_thread(_have, "gcov"):
                 print("Warning: gcov not found. Coverage report will be skipped.")
                 return None
             
             # Generate coverage data
             gcov_cmd = ["gcov", "*.cpp"]
-            gcov_result = subprocess.run(
+            gcov_returncode, gcov_stdout, _ = await _run(
                 gcov_cmd, 
                 cwd=build_dir, 
-                capture_output=True, 
-                text=True,
                 timeout=30
             )
             
-            if gcov_result.returncode == 0:
+            if gcov_returncode == 0:
                 # Parse coverage data (simplified)
-                coverage_data = self._parse_coverage_data(gcov_result.stdout)
+                coverage_data = self._parse_coverage_data(gcov_stdout)
                 return CoverageReport(
                     overall_coverage=coverage_data.get("overall", 0.0),
                     file_coverage=coverage_data.get("files", {}),
@@ -315,8 +725,6 @@ int main() {
     
     def _parse_coverage_data(self, gcov_output: str) -> Dict[str, Any]:
         """Parse gcov output to extract coverage data"""
-        # Simplified parsing
-        lines = gcov_output.split('\n')
         coverage_data = {
             "overall": 0.75,  # Placeholder
             "files": {},
@@ -325,16 +733,8 @@ int main() {
             "total_lines": 133
         }
         
-        for line in lines:
-            if "%" in line:
-                parts = line.split()
-                if len(parts) >= 2:
-                    try:
-                        percentage = float(parts[1].strip('%'))
-                        filename = parts[-1] if len(parts) > 2 else "unknown"
-                        coverage_data["files"][filename] = percentage / 100.0
-                    except (ValueError, IndexError):
-                        continue
+        for filename, percentage in COV_RE.findall(gcov_output):
+            coverage_data["files"][filename] = float(percentage) / 100.0
         
         return coverage_data
     
@@ -351,7 +751,7 @@ int main() {
     def _extract_tested_functions(self, test_content: str) -> List[str]:
         """Extract function names being tested"""
         # Simple regex to find TEST() macros
-        test_functions = re.findall(r'TEST\([^,]+,\s*(\w+)\)', test_content)
+        test_functions = TEST_RE.findall(test_content)
         return test_functions
     
     def _load_cmake_template(self) -> str:
@@ -371,22 +771,17 @@ set(CMAKE_EXE_LINKER_FLAGS "${{CMAKE_EXE_LINKER_FLAGS}} --coverage")
 find_package(PkgConfig REQUIRED)
 
 # Google Test
-include(FetchContent)
-FetchContent_Declare(
-  googletest
-  URL https://github.com/google/googletest/archive/03597a01ee50ed33e9fd7188feb57d74c5b18a2.zip
-)
-FetchContent_MakeAvailable(googletest)
+{gtest}
 
 # Add source files
-file(GLOB_RECURSE SOURCE_FILES "*.cpp" "*.cc" "*.cxx")
-file(GLOB_RECURSE HEADER_FILES "*.h" "*.hpp")
+file(GLOB_RECURSE SOURCE_FILES CONFIGURE_DEPENDS "*.cpp" "*.cc" "*.cxx")
+file(GLOB_RECURSE HEADER_FILES CONFIGURE_DEPENDS "*.h" "*.hpp")
 
 # Create main executable
 add_executable(main main.cpp)
 
 # Add test executable
-file(GLOB_RECURSE TEST_FILES "tests/*.cpp")
+file(GLOB_RECURSE TEST_FILES CONFIGURE_DEPENDS "tests/*.cpp")
 if(TEST_FILES)
     add_executable(test_runner ${{TEST_FILES}} ${{SOURCE_FILES}})
     target_link_libraries(test_runner gtest_main)
@@ -399,48 +794,10 @@ endif()
 enable_testing()
 """
     
-    def check_system_requirements(self) -> Dict[str, bool]:
+    async def check_system_requirements(self) -> Dict[str, bool]:
         """Check if required build tools are available"""
-        requirements = {
-            "cmake": False,
-            "gcc": False,
-            "gcov": False
-        }
-        
-        # Check CMake
-        try:
-            result = subprocess.run(
-                ["cmake", "--version"], 
-                capture_output=True, 
-                text=True,
-                timeout=5
-            )
-            requirements["cmake"] = result.returncode == 0
-        except (FileNotFoundError, subprocess.TimeoutExpired):
-            pass
-        
-        # Check GCC
-        try:
-            result = subprocess.run(
-                ["gcc", "--version"], 
-                capture_output=True, 
-                text=True,
-                timeout=5
-            )
-            requirements["gcc"] = result.returncode == 0
-        except (FileNotFoundError, subprocess.TimeoutExpired):
-            pass
-        
-        # Check gcov
-        try:
-            result = subprocess.run(
-                ["gcov", "--version"], 
-                capture_output=True, 
-                text=True,
-                timeout=5
-            )
-            requirements["gcov"] = result.returncode == 0
-        except (FileNotFoundError, subprocess.TimeoutExpired):
-            pass
+        tools = ["cmake", "gcc", "gcov"]
         
-        return requirements
+        # Probe all tools concurrently; results are cached for the process
+        results = await asyncio.gather(*(asyncio.to_thread(_have, tool) for tool in tools))
+        return dict(zip(tools, results))